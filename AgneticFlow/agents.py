@@ -7,61 +7,295 @@ from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.caches import InMemoryCache
+from langchain_core.globals import set_llm_cache
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+import asyncio
+import copy
+import functools
+import hashlib
+import httpx
 import json
+import logging
+import openai
 import re
+import time
+from collections import Counter
 from config import Config
 
-
-class AnalysisAgent:
-    """Agent for product analysis with chat-based refinement"""
-    
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model="gpt-4",
-            temperature=0.7,
-            openai_api_key=Config.OPENAI_API_KEY
+logger = logging.getLogger(__name__)
+
+# Count of JSON parse failures per agent class; lets us quantify how often
+# the json_object response format still needs the salvage fallback
+PARSE_FAILURES: Counter = Counter()
+
+try:
+    from image_generation import ImageGenerator
+except ImportError:
+    ImageGenerator = None
+
+# Preload tiktoken encoders at import so the first request in a fresh
+# worker doesn't pay the lazy ~200ms encoder load inside the hot path
+try:
+    import tiktoken
+    tiktoken.encoding_for_model("gpt-4")
+    tiktoken.encoding_for_model("gpt-4o-mini")
+except Exception as e:
+    print(f"tiktoken preload skipped: {e}")
+
+
+@functools.lru_cache(maxsize=1)
+def _shared_image_gen() -> "ImageGenerator":
+    """Construct the ImageGenerator (and its GenAI client) exactly once"""
+    if ImageGenerator is None:
+        raise ImportError("image_generation.ImageGenerator is unavailable")
+    return ImageGenerator()
+
+
+# Shared retry policy for transient OpenAI failures: jittered exponential
+# backoff so concurrent agents don't re-hammer the API in lockstep
+llm_retry = retry(
+    retry=retry_if_exception_type((
+        openai.RateLimitError,
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+    )),
+    wait=wait_random_exponential(multiplier=1, max=30),
+    stop=stop_after_attempt(5),
+    reraise=True,
+)
+
+
+# Cache LLM responses in-process so repeated identical prompts (e.g. re-running
+# the same URL or the deterministic NavigationAgent router) skip the API call.
+# Keyed on (model, params, rendered prompt) by LangChain.
+set_llm_cache(InMemoryCache())
+
+
+# Shared semaphore so concurrent agent calls don't blow past OpenAI rate limits
+LLM_SEMAPHORE = asyncio.Semaphore(Config.MAX_CONCURRENT_LLM_REQUESTS)
+
+# One ChatOpenAI instance per (model, temperature, json_mode, max_tokens)
+# combination, shared across all agents. All instances ride the same two
+# httpx pools below (one sync, one async), so TCP/TLS sessions to the
+# OpenAI endpoint are reused across models and warming any one client
+# warms them all.
+_LLM_INSTANCES: Dict[tuple, ChatOpenAI] = {}
+_OPENAI_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+_OPENAI_HTTP_CLIENT = httpx.Client(limits=_OPENAI_LIMITS)
+_OPENAI_ASYNC_HTTP_CLIENT = httpx.AsyncClient(limits=_OPENAI_LIMITS)
+
+
+def get_llm(model: str, temperature: float, json_mode: bool = False,
+            max_tokens: Optional[int] = None) -> ChatOpenAI:
+    """Return a shared ChatOpenAI client for the given settings"""
+    key = (model, temperature, json_mode, max_tokens)
+    if key not in _LLM_INSTANCES:
+        kwargs = {}
+        if json_mode:
+            kwargs["model_kwargs"] = {"response_format": {"type": "json_object"}}
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        _LLM_INSTANCES[key] = ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            openai_api_key=Config.OPENAI_API_KEY,
+            http_client=_OPENAI_HTTP_CLIENT,
+            http_async_client=_OPENAI_ASYNC_HTTP_CLIENT,
+            **kwargs
         )
-    
-    async def analyze(self, product_data: Dict, feedback_history: List[str] = None) -> Dict:
-        """Generate or refine product analysis"""
-        feedback_history = feedback_history or []
-        
-        if not feedback_history:
-            # Initial analysis
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", "You are an expert marketing analyst specializing in product analysis and target audience identification."),
-                ("human", """
-Analyze this product and provide a detailed analysis:
+    return _LLM_INSTANCES[key]
+
+# Bounds on free-text fields injected into prompts, so one oversized page
+# scrape or runaway analysis JSON doesn't balloon token spend
+MAX_RAW_TEXT_CHARS = 1500
+MAX_ANALYSIS_CHARS = 4000
+MAX_DESCRIPTION_CHARS = 600
+MAX_IMAGE_PROMPT_CHARS = 800
+
+
+def _truncate(text: str, limit: int) -> str:
+    """Clip text to limit chars, marking the cut so the model knows"""
+    if len(text) <= limit:
+        return text
+    return text[:limit] + "\n[...truncated]"
+
+
+def _clip(text: str, max_chars: int) -> str:
+    """Clip text at a word boundary, marking the cut with an ellipsis"""
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(' ', 1)[0] + '…'
+
+
+def _analysis_field(analysis: Dict, key: str) -> str:
+    """Serialize an analysis field for prompt injection.
+
+    Compact JSON is 15-30% smaller than Python's str(dict) and is what the
+    model was trained to parse. Deliberately not memoized on the dict:
+    the analysis object flows out through API responses, workflow state
+    and the response cache, so stashing private keys in it leaked
+    _cached_* rows to every consumer. Serializing a small field is
+    microseconds against the multi-second LLM call it feeds.
+    """
+    value = analysis.get(key, '')
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def _extract_json(text: str) -> Dict:
+    """Salvage a JSON object embedded in prose or markdown fences.
+
+    Single linear pass tracking string/escape state and brace depth (no
+    regex backtracking); returns the first balanced top-level object.
+    Raises ValueError when the text contains no parseable object.
+    """
+    start = text.find('{')
+    if start == -1:
+        raise ValueError("no JSON object found")
+    depth = 0
+    in_str = False
+    esc = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if esc:
+            esc = False
+        elif c == '\\' and in_str:
+            esc = True
+        elif c == '"':
+            in_str = not in_str
+        elif not in_str:
+            if c == '{':
+                depth += 1
+            elif c == '}':
+                depth -= 1
+                if depth == 0:
+                    return json.loads(text[start:i + 1])
+    raise ValueError("unbalanced JSON object")
+
+
+class ResponseCache:
+    """Small in-process TTL cache for whole agent responses.
+
+    Complements the token-level LLM cache: entries are keyed on the raw
+    inputs (hashed), so repeat runs of the same URL or script skip both
+    prompt rendering and the API call.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._store: Dict[str, tuple] = {}
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        canonical = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+    def get(self, key: str):
+        entry = self._store.get(key)
+        if not entry:
+            return None
+        expires_at, value = entry
+        if time.monotonic() > expires_at:
+            del self._store[key]
+            return None
+        return value
+
+    def set(self, key: str, value, ttl: Optional[float] = None) -> None:
+        """Store value; ttl overrides the cache default for this entry"""
+        if len(self._store) >= self.maxsize:
+            # Evict the entry closest to expiry
+            oldest = min(self._store, key=lambda k: self._store[k][0])
+            del self._store[oldest]
+        self._store[key] = (time.monotonic() + (ttl if ttl is not None else self.ttl), value)
+
+
+RESPONSE_CACHE = ResponseCache()
+
+# In-flight deduplication for cacheable agent calls: under concurrency,
+# N identical requests arriving before the first result lands would each
+# fire their own LLM call; instead the first runs and the rest await it
+_INFLIGHT: Dict[str, asyncio.Future] = {}
+
+
+async def _single_flight(key: str, producer):
+    """Run producer() once per key; concurrent callers share the result"""
+    existing = _INFLIGHT.get(key)
+    if existing is not None:
+        return await existing
+    future = asyncio.get_running_loop().create_future()
+    _INFLIGHT[key] = future
+    try:
+        result = await producer()
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        del _INFLIGHT[key]
+
+
+# Compiled once at import. Splitting on the "SCRIPT [N]:" delimiter is a
+# single linear pass, unlike the previous DOTALL lookahead findall which
+# rescanned the text per match. The label is anchored at line start with
+# digits and colon required, so prose containing the word "script" (or
+# "description", "subscription"...) is never treated as a delimiter.
+SCRIPT_SPLIT = re.compile(r'^SCRIPT\s*\[?\d+\]?\s*:', re.IGNORECASE | re.MULTILINE)
+TRAILING_DASHES = re.compile(r'-+\s*$')
+
+
+# Prompts shared between the realtime agents and the offline batch path
+_ANALYSIS_INITIAL_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are an expert marketing analyst specializing in product analysis and target audience identification.
+
+Analyze the product the user provides and deliver a detailed analysis covering:
+1. Product Category and Key Features
+2. Target Audience (demographics, psychographics, pain points)
+3. Unique Selling Propositions (USPs)
+4. Marketing Angles and Emotional Triggers
+5. Competitive Positioning
 
+Format as JSON with keys: category, features, target_audience, usps, marketing_angles, positioning"""),
+    ("human", """
 Product Name: {title}
 Description: {description}
 Price: {price}
 Additional Context: {raw_text}
+""")
+])
 
-Provide:
-1. Product Category and Key Features
-2. Target Audience (demographics, psychographics, pain points)
-3. Unique Selling Propositions (USPs)
-4. Marketing Angles and Emotional Triggers
-5. Competitive Positioning
+_SCRIPT_INITIAL_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a creative copywriter specializing in short-form video ad scripts for social media.
 
-Format as JSON with keys: category, features, target_audience, usps, marketing_angles, positioning
+Create ONE short-form video ad script (30-45 seconds) for the product the user provides.
+
+The script should:
+- Hook viewers in the first 3 seconds
+- Address a pain point or desire
+- Highlight key benefits
+- Include a clear call-to-action
+- Be conversational and engaging
+- Use AIDA framework (Attention, Interest, Desire, Action)
+- Follow the approach the user specifies
+
+Output only the spoken-word voice over (around 100 words max), with no labels or additional commentary."""),
+    ("human", """
+Product: {title}
+Target Audience: {target_audience}
+USPs: {usps}
+Marketing Angles: {marketing_angles}
+Approach: {angle}
 """)
-            ])
-            
-            chain = prompt | self.llm | StrOutputParser()
-            result = await chain.ainvoke({
-                "title": product_data.get('title', ''),
-                "description": product_data.get('description', ''),
-                "price": product_data.get('price', ''),
-                "raw_text": product_data.get('raw_text', '')
-            })
-        else:
-            # Refinement based on feedback
-            latest_feedback = feedback_history[-1]
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", "You are an expert marketing analyst. Refine the product analysis based on user feedback while maintaining accuracy."),
-                ("human", """
+])
+
+_ANALYSIS_REFINE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are an expert marketing analyst. Refine the product analysis based on user feedback while maintaining accuracy.
+
+Refine the analysis addressing the user's feedback. Maintain the JSON format with keys: category, features, target_audience, usps, marketing_angles, positioning"""),
+    ("human", """
 Current Analysis:
 {current_analysis}
 
@@ -71,48 +305,285 @@ Description: {description}
 Price: {price}
 
 User Feedback: {feedback}
+""")
+])
+
+_SCRIPT_REFINE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a creative copywriter. Refine the ad scripts based on user feedback while maintaining quality and effectiveness.
 
-Refine the analysis addressing the user's feedback. Maintain the JSON format with keys: category, features, target_audience, usps, marketing_angles, positioning
+Refine the 3 scripts addressing the user's feedback. Maintain the format:
+SCRIPT [1/2/3]:
+[Script content]
+---
+
+Keep scripts 30-45 seconds when read aloud (around 100 words max each)."""),
+    ("human", """
+Current Scripts:
+{current_scripts}
+
+Product: {title}
+Target Audience: {target_audience}
+USPs: {usps}
+
+User Feedback: {feedback}
 """)
-            ])
-            
-            chain = prompt | self.llm | StrOutputParser()
-            result = await chain.ainvoke({
-                "current_analysis": json.dumps(product_data.get('current_analysis', {}), indent=2),
+])
+
+_SCRIPT_SINGLE_REFINE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are a creative copywriter. Modify the script based on specific user requests while maintaining effectiveness."),
+    ("human", """
+Current Script:
+{current_script}
+
+User Request: {feedback}
+
+Provide the modified script (30-45 seconds when read aloud). Output only the script content without labels or commentary.
+""")
+])
+
+_IMG_INITIAL_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are an expert in creating detailed image generation prompts for commercial advertisements."),
+    ("human", """
+Create a detailed image generation prompt for a commercial advertisement featuring this product:
+
+Product: {title}
+Description: {description}
+Script Context: {script_context}
+Target Audience: {target_audience}
+Marketing Angle: {marketing_angle}
+
+The prompt should describe:
+- A professional commercial advertisement static
+- High-quality, aesthetic setting suitable for marketing
+- Product as the focal point
+- Modern, premium, commercial photography style
+- Appropriate mood and lighting based on the marketing angle
+
+Output only the prompt, no additional commentary.
+""")
+])
+
+_IMG_REFINE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are an expert in creating detailed image generation prompts for commercial advertisements."),
+    ("human", """
+Current Image Generation Prompt:
+{current_prompt}
+
+Product Context:
+- Product: {title}
+- Description: {description}
+- Script Context: {script_context}
+
+User Feedback: {feedback}
+
+Create a refined, detailed image generation prompt that addresses the user's feedback.
+The prompt should describe a professional commercial advertisement static featuring the product.
+Include details about setting, style, composition, lighting, and mood.
+Keep it focused on the product as the focal point.
+""")
+])
+
+# LangChain message types -> OpenAI API roles, for batch request bodies
+_ROLE_MAP = {"system": "system", "human": "user", "ai": "assistant"}
+
+
+def _to_api_messages(prompt: ChatPromptTemplate, inputs: Dict) -> List[Dict]:
+    """Render a prompt template into OpenAI chat-completion message dicts"""
+    return [
+        {"role": _ROLE_MAP.get(message.type, message.type), "content": message.content}
+        for message in prompt.format_messages(**inputs)
+    ]
+
+
+@llm_retry
+async def _ainvoke(chain, inputs: Dict) -> str:
+    """Invoke a chain while holding the shared concurrency semaphore"""
+    async with LLM_SEMAPHORE:
+        t0 = time.perf_counter()
+        result = await chain.ainvoke(inputs)
+        logger.info("llm_call", extra={"ms": round((time.perf_counter() - t0) * 1000, 1)})
+        return result
+
+
+async def _astream(chain, inputs: Dict, on_token) -> str:
+    """Stream a chain's output, forwarding each token to on_token.
+
+    Returns the accumulated text so callers get the same result as
+    _ainvoke while downstream consumers (UI, parsers) can start work
+    as soon as the first tokens arrive.
+
+    Deliberately not wrapped in llm_retry: tokens are forwarded as they
+    arrive, so replaying the call after a mid-stream failure would emit
+    the already-rendered prefix a second time to CLI and SSE consumers.
+    Streaming callers surface the error instead.
+    """
+    async with LLM_SEMAPHORE:
+        t0 = time.perf_counter()
+        parts = []
+        async for chunk in chain.astream(inputs):
+            parts.append(chunk)
+            if on_token:
+                on_token(chunk)
+        logger.info("llm_stream", extra={"ms": round((time.perf_counter() - t0) * 1000, 1)})
+        return "".join(parts)
+
+
+class AnalysisAgent:
+    """Agent for product analysis with chat-based refinement"""
+
+    def __init__(self):
+        # JSON mode guarantees parseable output instead of hoping the model
+        # sticks to the format (requires a 1106+ model, hence gpt-4o)
+        self.llm = get_llm("gpt-4o", temperature=0.7, json_mode=True)
+        # LCEL chains compiled once per agent instead of per call
+        self.initial_chain = _ANALYSIS_INITIAL_PROMPT | self.llm | StrOutputParser()
+        self.refine_chain = _ANALYSIS_REFINE_PROMPT | self.llm | StrOutputParser()
+    
+    async def analyze(self, product_data: Dict, feedback_history: List[str] = None,
+                      on_token=None) -> Dict:
+        """Generate or refine product analysis.
+
+        Pass on_token to stream tokens to the caller as they arrive.
+        """
+        feedback_history = feedback_history or []
+
+        async def run(chain, inputs):
+            if on_token:
+                return await _astream(chain, inputs, on_token)
+            return await _ainvoke(chain, inputs)
+
+        if not feedback_history:
+            # Initial analysis: identical product inputs short-circuit to the
+            # cached result instead of re-running gpt-4o
+            cache_key = ResponseCache.make_key(
+                "analysis",
+                product_data.get('title', ''),
+                product_data.get('description', ''),
+                product_data.get('price', ''),
+                product_data.get('raw_text', '')
+            )
+            cached = RESPONSE_CACHE.get(cache_key)
+            if cached is not None and not on_token:
+                # Hand out a copy: callers mutate the analysis (feedback
+                # keys, workflow state) and must not pollute the cache
+                return copy.deepcopy(cached)
+
+            # Static instructions stay in the system message so providers can
+            # reuse the cached prompt prefix; only the variables change per call
+            inputs = {
                 "title": product_data.get('title', ''),
-                "description": product_data.get('description', ''),
+                "description": _clip(product_data.get('description', ''), MAX_DESCRIPTION_CHARS),
+                "price": product_data.get('price', ''),
+                "raw_text": _truncate(product_data.get('raw_text', ''), MAX_RAW_TEXT_CHARS)
+            }
+            if on_token:
+                result = await run(self.initial_chain, inputs)
+            else:
+                # Concurrent identical analyses share one in-flight call
+                result = await _single_flight(
+                    cache_key, lambda: _ainvoke(self.initial_chain, inputs))
+        else:
+            # Refinement based on feedback
+            latest_feedback = feedback_history[-1]
+
+            # Compact serialization (vs indent=2) drops ~30% of the bytes,
+            # and when the feedback names specific sections we only resend
+            # those instead of the whole prior analysis
+            current = product_data.get('current_analysis', {})
+            if isinstance(current, dict) and current:
+                mentioned = [k for k in current if k.lower() in latest_feedback.lower()]
+                if mentioned:
+                    current = {k: current[k] for k in mentioned}
+            serialized_analysis = json.dumps(current, separators=(',', ':'), ensure_ascii=False, default=str)
+
+            result = await run(self.refine_chain, {
+                "current_analysis": _truncate(serialized_analysis, MAX_ANALYSIS_CHARS),
+                "title": product_data.get('title', ''),
+                "description": _clip(product_data.get('description', ''), MAX_DESCRIPTION_CHARS),
                 "price": product_data.get('price', ''),
                 "feedback": latest_feedback
             })
         
         try:
-            return json.loads(result)
-        except:
-            return {"analysis": result}
+            analysis = json.loads(result)
+        except json.JSONDecodeError:
+            # JSON mode makes this rare, but when the model wraps the object
+            # in fences or prose, salvage it instead of discarding structure
+            # (a raw-text fallback forces a costly re-analysis downstream)
+            PARSE_FAILURES[self.__class__.__name__] += 1
+            try:
+                analysis = _extract_json(result)
+            except (ValueError, json.JSONDecodeError):
+                logger.warning("analysis JSON unsalvageable, keeping raw text")
+                analysis = {"analysis": result}
+
+        if not feedback_history:
+            RESPONSE_CACHE.set(cache_key, copy.deepcopy(analysis))
+        return analysis
+
+    def analyze_batch(self, products: List[Dict]) -> List[Dict]:
+        """Analyze many products through the OpenAI Batch API.
+
+        Intended for offline bulk runs (nightly generation, historical
+        catalogs): half the realtime price and no rate-limit contention,
+        at the cost of up to 24h turnaround. Blocks until results land.
+        """
+        from batch_runner import BatchRunner
+
+        runner = BatchRunner()
+        requests = [
+            BatchRunner.chat_request(
+                custom_id=str(i),
+                model="gpt-4o",
+                messages=_to_api_messages(_ANALYSIS_INITIAL_PROMPT, {
+                    "title": product.get('title', ''),
+                    "description": product.get('description', ''),
+                    "price": product.get('price', ''),
+                    "raw_text": _truncate(product.get('raw_text', ''), MAX_RAW_TEXT_CHARS)
+                }),
+                temperature=0.7,
+                response_format={"type": "json_object"}
+            )
+            for i, product in enumerate(products)
+        ]
+        results = runner.run(requests)
+
+        analyses = []
+        for i in range(len(products)):
+            raw = results.get(str(i), '')
+            try:
+                analyses.append(json.loads(raw))
+            except json.JSONDecodeError:
+                analyses.append({"analysis": raw})
+        return analyses
 
 
 class ScriptGenerationAgent:
     """Agent for generating ad scripts with chat-based refinement"""
     
+    # Distinct creative approaches, one concurrent LLM call each
+    SCRIPT_ANGLES = ["problem-solution", "testimonial-style", "lifestyle-focused"]
+
     def __init__(self):
-        self.llm = ChatOpenAI(
-            model="gpt-4",
-            temperature=0.8,
-            openai_api_key=Config.OPENAI_API_KEY
-        )
+        self.llm = get_llm("gpt-4", temperature=0.8)
+        # LCEL chains compiled once per agent instead of per call
+        self.initial_chain = _SCRIPT_INITIAL_PROMPT | self.llm | StrOutputParser()
+        self.refine_chain = _SCRIPT_REFINE_PROMPT | self.llm | StrOutputParser()
+        self.single_refine_chain = _SCRIPT_SINGLE_REFINE_PROMPT | self.llm | StrOutputParser()
     
     def _parse_scripts(self, text: str) -> List[str]:
         """Parse scripts from LLM output"""
-        pattern = r'SCRIPT\s*(?:\[?\d+\]?)?:?(.*?)(?=SCRIPT\s*(?:\[?\d+\]?)?:?|$)'
-        matches = re.findall(pattern, text, re.DOTALL | re.IGNORECASE)
-        
+        parts = SCRIPT_SPLIT.split(text)
+
         scripts = []
-        for match in matches:
-            cleaned = match.strip()
-            cleaned = re.sub(r'-+$', '', cleaned).strip()
-            if cleaned:
-                scripts.append(cleaned)
-        
+        if len(parts) > 1:
+            # parts[0] is whatever preceded the first label ("Here are
+            # your scripts:" preamble), not a script — drop it
+            for part in parts[1:]:
+                cleaned = TRAILING_DASHES.sub('', part.strip()).strip()
+                if cleaned:
+                    scripts.append(cleaned)
+
         if not scripts:
             if '---' in text:
                 parts = text.split('---')
@@ -122,47 +593,54 @@ class ScriptGenerationAgent:
         
         return scripts
     
-    async def generate_scripts(self, product_data: Dict, analysis: Dict, feedback_history: List[str] = None) -> List[str]:
-        """Generate or refine ad scripts"""
+    async def generate_scripts(self, product_data: Dict, analysis: Dict, feedback_history: List[str] = None,
+                               on_token=None) -> List[str]:
+        """Generate or refine ad scripts.
+
+        Pass on_token to stream tokens as they arrive (e.g. to a UI)
+        instead of blocking until the full completion lands.
+        """
         feedback_history = feedback_history or []
+
+        async def run(chain, inputs):
+            if on_token:
+                return await _astream(chain, inputs, on_token)
+            return await _ainvoke(chain, inputs)
         
         if not feedback_history:
-            # Initial generation
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", "You are a creative copywriter specializing in short-form video ad scripts for social media."),
-                ("human", """
-Create 3 unique short-form video ad scripts (30-45 seconds each) for this product:
-
-Product: {title}
-Target Audience: {target_audience}
-USPs: {usps}
-Marketing Angles: {marketing_angles}
-
-Each script should:
-- Hook viewers in the first 3 seconds
-- Address a pain point or desire
-- Highlight key benefits
-- Include a clear call-to-action
-- Be conversational and engaging
-- Use AIDA framework (Attention, Interest, Desire, Action)
-
-Format each script with:
-SCRIPT [1/2/3]:
-[Script content - spoken word only, 30-45 seconds when read aloud, around 100 words max.]
----
-
-Make each script distinctly different in approach (problem-solution, testimonial-style, lifestyle-focused).
-Output only the voice over without additional commentary.
-""")
-            ])
-            
-            chain = prompt | self.llm | StrOutputParser()
-            result = await chain.ainvoke({
+            # Initial generation: one independent single-script call per
+            # approach, fired concurrently, so wall time is the slowest
+            # ~100-word completion rather than one ~300-word completion
+            inputs = {
                 "title": product_data.get('title', ''),
-                "target_audience": str(analysis.get('target_audience', '')),
-                "usps": str(analysis.get('usps', '')),
-                "marketing_angles": str(analysis.get('marketing_angles', ''))
-            })
+                "target_audience": _analysis_field(analysis, 'target_audience'),
+                "usps": _analysis_field(analysis, 'usps'),
+                "marketing_angles": _analysis_field(analysis, 'marketing_angles')
+            }
+            if on_token:
+                # Three concurrent streams writing one callback would
+                # interleave tokens from different scripts; stream the
+                # angles one after another so the text arrives readable
+                results = [
+                    await run(self.initial_chain, {**inputs, "angle": angle})
+                    for angle in self.SCRIPT_ANGLES
+                ]
+            else:
+                results = await asyncio.gather(*[
+                    run(self.initial_chain, {**inputs, "angle": angle})
+                    for angle in self.SCRIPT_ANGLES
+                ])
+            # Each response is already a single script; the parser only
+            # kicks in if the model sneaks SCRIPT labels back in
+            scripts = []
+            for result in results:
+                if SCRIPT_SPLIT.search(result):
+                    scripts.extend(self._parse_scripts(result))
+                else:
+                    cleaned = result.strip()
+                    if cleaned:
+                        scripts.append(cleaned)
+            return scripts
         else:
             # Refinement
             latest_feedback = feedback_history[-1]
@@ -170,58 +648,69 @@ Output only the voice over without additional commentary.
             for i, script in enumerate(product_data.get('current_scripts', []), 1):
                 scripts_text += f"\nSCRIPT {i}:\n{script}\n---\n"
             
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", "You are a creative copywriter. Refine the ad scripts based on user feedback while maintaining quality and effectiveness."),
-                ("human", """
-Current Scripts:
-{current_scripts}
-
-Product: {title}
-Target Audience: {target_audience}
-USPs: {usps}
-
-User Feedback: {feedback}
-
-Refine the 3 scripts addressing the user's feedback. Maintain the format:
-SCRIPT [1/2/3]:
-[Script content]
----
-
-Keep scripts 30-45 seconds when read aloud (around 100 words max each).
-""")
-            ])
-            
-            chain = prompt | self.llm | StrOutputParser()
-            result = await chain.ainvoke({
+            result = await run(self.refine_chain, {
                 "current_scripts": scripts_text,
                 "title": product_data.get('title', ''),
-                "target_audience": str(analysis.get('target_audience', '')),
-                "usps": str(analysis.get('usps', '')),
+                "target_audience": _analysis_field(analysis, 'target_audience'),
+                "usps": _analysis_field(analysis, 'usps'),
                 "feedback": latest_feedback
             })
         
         return self._parse_scripts(result)
-    
-    async def refine_script(self, script: str, feedback: str) -> str:
-        """Refine a single selected script"""
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are a creative copywriter. Modify the script based on specific user requests while maintaining effectiveness."),
-            ("human", """
-Current Script:
-{current_script}
 
-User Request: {feedback}
+    def generate_scripts_batch(self, products: List[Dict], analyses: List[Dict]) -> List[List[str]]:
+        """Generate scripts for many products through the OpenAI Batch API.
+
+        Companion to AnalysisAgent.analyze_batch for offline bulk runs:
+        one request per (product, angle) pair, all submitted as a single
+        batch job. Blocks until results land.
+        """
+        from batch_runner import BatchRunner
+
+        runner = BatchRunner()
+        requests = [
+            BatchRunner.chat_request(
+                custom_id=f"{i}:{angle}",
+                model="gpt-4",
+                messages=_to_api_messages(_SCRIPT_INITIAL_PROMPT, {
+                    "title": product.get('title', ''),
+                    "target_audience": str(analysis.get('target_audience', '')),
+                    "usps": str(analysis.get('usps', '')),
+                    "marketing_angles": str(analysis.get('marketing_angles', '')),
+                    "angle": angle
+                }),
+                temperature=0.8
+            )
+            for i, (product, analysis) in enumerate(zip(products, analyses))
+            for angle in self.SCRIPT_ANGLES
+        ]
+        results = runner.run(requests)
+
+        all_scripts = []
+        for i in range(len(products)):
+            scripts = []
+            for angle in self.SCRIPT_ANGLES:
+                raw = results.get(f"{i}:{angle}")
+                if raw:
+                    scripts.extend(self._parse_scripts(raw))
+            all_scripts.append(scripts)
+        return all_scripts
+
+    async def refine_scripts(self, pairs: List[tuple]) -> List[str]:
+        """Refine multiple (script, feedback) pairs in one batched round-trip"""
+        results = await self.single_refine_chain.abatch(
+            [{"current_script": script, "feedback": feedback} for script, feedback in pairs],
+            config={"max_concurrency": 8}
+        )
+        return [result.strip() for result in results]
 
-Provide the modified script (30-45 seconds when read aloud). Output only the script content without labels or commentary.
-""")
-        ])
-        
-        chain = prompt | self.llm | StrOutputParser()
-        result = await chain.ainvoke({
+    async def refine_script(self, script: str, feedback: str) -> str:
+        """Refine a single selected script"""
+        result = await _ainvoke(self.single_refine_chain, {
             "current_script": script,
             "feedback": feedback
         })
-        
+
         return result.strip()
 
 
@@ -229,122 +718,123 @@ class ImageGenerationAgent:
     """Agent for generating images with chat-based refinement"""
     
     def __init__(self):
-        self.llm = ChatOpenAI(
-            model="gpt-4",
-            temperature=0.7,
-            openai_api_key=Config.OPENAI_API_KEY
-        )
-        # We'll still use the ImageGenerator for actual generation
-        from image_generation import ImageGenerator
-        self.image_gen = ImageGenerator()
+        self.llm = get_llm("gpt-4", temperature=0.7)
+        # LCEL chains compiled once per agent instead of per call
+        self.initial_chain = _IMG_INITIAL_PROMPT | self.llm | StrOutputParser()
+        self.refine_chain = _IMG_REFINE_PROMPT | self.llm | StrOutputParser()
+        # We'll still use the ImageGenerator for actual generation;
+        # the instance is shared so the GenAI client is built once
+        self.image_gen = _shared_image_gen()
     
     async def generate_prompt(self, product_data: Dict, script: str, analysis: Dict = None, feedback: str = None) -> str:
         """Generate or refine image generation prompt using LLM"""
         
         if feedback:
             # Refine prompt based on feedback
-            prompt_template = ChatPromptTemplate.from_messages([
-                ("system", "You are an expert in creating detailed image generation prompts for commercial advertisements."),
-                ("human", """
-Current Image Generation Prompt:
-{current_prompt}
-
-Product Context:
-- Product: {title}
-- Description: {description}
-- Script Context: {script_context}
-
-User Feedback: {feedback}
-
-Create a refined, detailed image generation prompt that addresses the user's feedback. 
-The prompt should describe a professional commercial advertisement static featuring the product.
-Include details about setting, style, composition, lighting, and mood.
-Keep it focused on the product as the focal point.
-""")
-            ])
-            
-            chain = prompt_template | self.llm | StrOutputParser()
-            result = await chain.ainvoke({
-                "current_prompt": product_data.get('current_prompt', ''),
+            result = await _ainvoke(self.refine_chain, {
+                "current_prompt": _clip(product_data.get('current_prompt', ''), MAX_IMAGE_PROMPT_CHARS),
                 "title": product_data.get('title', ''),
-                "description": product_data.get('description', ''),
+                "description": _clip(product_data.get('description', ''), MAX_DESCRIPTION_CHARS),
                 "script_context": script[:200],
                 "feedback": feedback
             })
             return result.strip()
         else:
-            # Initial prompt generation
-            prompt_template = ChatPromptTemplate.from_messages([
-                ("system", "You are an expert in creating detailed image generation prompts for commercial advertisements."),
-                ("human", """
-Create a detailed image generation prompt for a commercial advertisement featuring this product:
-
-Product: {title}
-Description: {description}
-Script Context: {script_context}
-Target Audience: {target_audience}
-Marketing Angle: {marketing_angle}
-
-The prompt should describe:
-- A professional commercial advertisement static
-- High-quality, aesthetic setting suitable for marketing
-- Product as the focal point
-- Modern, premium, commercial photography style
-- Appropriate mood and lighting based on the marketing angle
-
-Output only the prompt, no additional commentary.
-""")
-            ])
-            
-            chain = prompt_template | self.llm | StrOutputParser()
-            result = await chain.ainvoke({
+            # Initial prompt generation; same script + product inputs reuse
+            # the cached prompt instead of another gpt-4 call
+            cache_key = ResponseCache.make_key(
+                "image_prompt",
+                product_data.get('title', ''),
+                product_data.get('description', ''),
+                script,
+                str(analysis.get('target_audience', '')) if analysis else '',
+                str(analysis.get('marketing_angles', '')) if analysis else ''
+            )
+            cached = RESPONSE_CACHE.get(cache_key)
+            if cached is not None:
+                return cached
+
+            inputs = {
                 "title": product_data.get('title', ''),
-                "description": product_data.get('description', ''),
+                "description": _clip(product_data.get('description', ''), MAX_DESCRIPTION_CHARS),
                 "script_context": script[:200],
                 "target_audience": str(analysis.get('target_audience', '')) if analysis else '',
                 "marketing_angle": str(analysis.get('marketing_angles', '')) if analysis else ''
-            })
-            return result.strip()
+            }
+            # Concurrent identical prompt requests share one in-flight call
+            result = await _single_flight(
+                cache_key, lambda: _ainvoke(self.initial_chain, inputs))
+            image_prompt = result.strip()
+            # Pure function of its inputs, so it can outlive the default
+            # one-hour TTL: repeat previews of the same draft stay free
+            RESPONSE_CACHE.set(cache_key, image_prompt, ttl=86400)
+            return image_prompt
     
+    async def generate_prompts(self, product_data: Dict, scripts: List[str], analysis: Dict = None) -> List[str]:
+        """Generate image prompts for multiple scripts concurrently"""
+        coros = [
+            self.generate_prompt(product_data, script, analysis)
+            for script in scripts
+        ]
+        return await asyncio.gather(*coros)
+
     def generate_images(self, product_url: str, image_prompt: str, num_images: int = 2) -> List[str]:
         """Generate images using the refined prompt"""
         return self.image_gen.generate_ad_creatives_with_prompt(
-            product_url, 
-            image_prompt, 
+            product_url,
+            image_prompt,
             num_images
         )
 
+    async def agenerate_images(self, product_url: str, image_prompt: str, num_images: int = 2) -> List[str]:
+        """Async variant of generate_images; safe to call from the event loop.
+
+        The GenAI SDK is synchronous and each image is an independent
+        I/O-bound provider round-trip, so every image gets its own thread
+        and the event loop stays free for other agents in the meantime.
+        """
+        results = await asyncio.gather(*[
+            asyncio.to_thread(self.image_gen.generate_ad_creatives_with_prompt,
+                              product_url, image_prompt, 1)
+            for _ in range(num_images)
+        ])
+        return [path for batch in results for path in batch]
+
+    def generate_images_batch(self, product_url: str, prompts: List[str], num_images_each: int = 2) -> List[List[str]]:
+        """Generate images for several prompts concurrently.
+
+        The GenAI SDK is synchronous, so each prompt runs on its own
+        thread instead of serializing the provider round-trips.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        if not prompts:
+            return []
+
+        with ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+            results = executor.map(
+                lambda p: self.image_gen.generate_ad_creatives_with_prompt(product_url, p, num_images_each),
+                prompts
+            )
+        return list(results)
+
 
 class NavigationAgent:
     """Agent for determining navigation intent from user messages"""
-    
+
     def __init__(self):
-        self.llm = ChatOpenAI(
-            model="gpt-4",
-            temperature=0,
-            openai_api_key=Config.OPENAI_API_KEY
-        )
-    
-    async def analyze_intent(self, state: Dict) -> Dict[str, Any]:
-        """Analyze user message to determine navigation intent"""
-        messages = state.get("messages", [])
-        if not messages:
-            return {"intent": "continue"}
-            
-        # Get the last user message
-        last_user_message = None
-        for msg in reversed(messages):
-            if msg.get("role") == "user":
-                last_user_message = msg.get("content")
-                break
-        
-        if not last_user_message:
-            return {"intent": "continue"}
-            
-        current_step = state.get("current_step", "scrape")
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a navigation router for an ad campaign generation workflow.
+        # Intent classification doesn't need gpt-4; the mini model is an
+        # order of magnitude cheaper and noticeably faster per turn
+        # Routing answers are a couple of JSON fields; cap output so a
+        # rambling completion can't stretch the turn
+        self.llm = get_llm("gpt-4o-mini", temperature=0, json_mode=True, max_tokens=150)
+        # LCEL chain compiled once per agent instead of per call
+        self.router_chain = self.ROUTER_PROMPT | self.llm | StrOutputParser()
+
+    # Built once at class definition; the long rules block stays
+    # byte-identical across calls so provider prefix caching applies
+    ROUTER_PROMPT = ChatPromptTemplate.from_messages([
+        ("system", """You are a navigation router for an ad campaign generation workflow.
 Your job is to determine where the user wants to go based on their message and the current step.
 
 Workflow Steps:
@@ -372,26 +862,78 @@ Output JSON:
     "reasoning": "brief explanation"
 }}
 """),
-            ("human", """
+        ("human", """
 Current Step: {current_step}
 User Message: {user_message}
 
 Determine the navigation intent.
 """)
-        ])
-        
-        chain = prompt | self.llm | StrOutputParser()
-        result = await chain.ainvoke({
+    ])
+
+    # Deterministic shortcuts that avoid an LLM round-trip entirely
+    NEXT_KEYWORDS = {"next", "continue", "proceed", "looks good", "ok", "okay", "yes", "approve", "approved"}
+    COMPLETE_KEYWORDS = {"stop", "done", "complete", "quit", "exit", "finish", "finished"}
+    URL_PATTERN = re.compile(r'^(https?://|www\.)', re.IGNORECASE)
+    SELECT_SCRIPT_PATTERN = re.compile(r'(?:choose|select|option|script|use)\s*#?\s*(\d+)', re.IGNORECASE)
+
+    def _rule_based_intent(self, message: str, current_step: str) -> Optional[Dict[str, Any]]:
+        """Resolve structurally obvious intents without calling the LLM"""
+        cleaned = message.strip().lower().rstrip('.!')
+
+        if self.URL_PATTERN.match(message.strip()):
+            return {"intent": "scrape", "reasoning": "Message is a URL"}
+
+        if cleaned in self.NEXT_KEYWORDS:
+            return {"intent": "next", "reasoning": "Explicit approval/continue keyword"}
+
+        if cleaned in self.COMPLETE_KEYWORDS:
+            return {"intent": "complete", "reasoning": "Explicit stop keyword"}
+
+        if current_step in ("generate_scripts", "select_script"):
+            match = self.SELECT_SCRIPT_PATTERN.match(cleaned)
+            if match:
+                return {"intent": "select_script", "reasoning": f"Selected script {match.group(1)}"}
+
+        return None
+
+    async def analyze_intent(self, current_step, user_message: Optional[str] = None) -> Dict[str, Any]:
+        """Analyze a user message to determine navigation intent.
+
+        Takes (current_step, user_message) scalars - the prompt only uses
+        those two fields, so passing the full state risks shipping history
+        tokens for nothing. A legacy state dict may still be passed as the
+        sole argument; the last user turn is pulled from it (O(1) via
+        last_user_message, falling back to a reverse scan of messages).
+        """
+        if isinstance(current_step, dict):
+            state = current_step
+            user_message = state.get("last_user_message") or next(
+                (msg.get("content") for msg in reversed(state.get("messages", []))
+                 if msg.get("role") == "user"),
+                None
+            )
+            current_step = state.get("current_step", "scrape")
+
+        if not user_message:
+            return {"intent": "continue"}
+
+        # Try the cheap deterministic router first; only ambiguous
+        # messages fall through to the LLM
+        rule_result = self._rule_based_intent(user_message, current_step)
+        if rule_result:
+            return rule_result
+
+        result = await _ainvoke(self.router_chain, {
             "current_step": current_step,
-            "user_message": last_user_message
+            "user_message": user_message
         })
         
         try:
-            # Clean up potential markdown code blocks
-            cleaned_result = result.replace("```json", "").replace("```", "").strip()
-            return json.loads(cleaned_result)
-        except:
-            print(f"Failed to parse navigation intent: {result}")
+            # JSON mode guarantees a bare JSON object; no fence stripping needed
+            return json.loads(result)
+        except json.JSONDecodeError:
+            PARSE_FAILURES[self.__class__.__name__] += 1
+            logger.warning("failed to parse navigation intent: %s", result)
             return {"intent": "stay"}
 
 
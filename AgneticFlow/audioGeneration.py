@@ -10,33 +10,65 @@ from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_classic.memory import ConversationBufferMemory
 import time
+import asyncio
+import httpx
 from elevenlabs.client import ElevenLabs
 from elevenlabs.play import play
 load_dotenv()
 from config import Config
 
+# HTTP/2 multiplexes concurrent TTS calls over one connection when the
+# optional h2 extra (httpx[http2]) is installed; fall back to HTTP/1.1
+try:
+    import h2  # noqa: F401
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+
+# Shared connections to the ElevenLabs API: one keep-alive pool for sync
+# callers and one for async callers, instead of a fresh TLS handshake per call
+_session = requests.Session()
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            timeout=120,
+            http2=_HTTP2,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+        )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    """Close the shared pool on app shutdown so connections don't leak"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
 class ElevenLabsVoiceGenerator:
     """Handles text-to-speech generation using Eleven Labs API"""
-    
+
     def __init__(self):
-        self.api_key = "sk_13a64a9877a3d92e503ec078db070fb6fde8bdf8e40e67ef"
+        self.api_key = Config.ELEVENLABS_API_KEY
         if not self.api_key:
             print("WARNING: ELEVENLABS_API_KEY is not set in environment variables.")
-        else:
-            print(f"ELEVENLABS_API_KEY loaded: {self.api_key[:4]}...{self.api_key[-4:]}")
         self.voice_id = "raMcNf2S8wCmuaBcyI6E"
-    
-    def generate_voice(self, text: str, output_filename: str = "voiceover.mp3") -> str:
-        """Generate voice from text and save to file"""
-        
-        url = f"{Config.ELEVENLABS_TTS_URL}/{self.voice_id}"
-        
+
+    def _request_parts(self, text: str):
+        """Build the streaming TTS URL, headers and body"""
+        # The /stream endpoint returns audio chunks as they are synthesized
+        url = f"{Config.ELEVENLABS_TTS_URL}/{self.voice_id}/stream"
         headers = {
             "Accept": "audio/mpeg",
             "Content-Type": "application/json",
             "xi-api-key": self.api_key
         }
-        
         data = {
             "text": text,
             "model_id": "eleven_multilingual_v2",
@@ -45,14 +77,54 @@ class ElevenLabsVoiceGenerator:
                 "similarity_boost": 0.75
             }
         }
-        
+        return url, headers, data
+
+    def generate_voice(self, text: str, output_filename: str = "voiceover.mp3") -> str:
+        """Generate voice from text and save to file"""
+        url, headers, data = self._request_parts(text)
+
+        try:
+            with _session.post(url, json=data, headers=headers, stream=True) as response:
+                response.raise_for_status()
+                # Write chunks as they arrive instead of buffering the
+                # whole MP3 in memory first
+                with open(output_filename, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        f.write(chunk)
+
+            print(f"✓ Voice generated and saved to {output_filename}")
+            return output_filename
+        except Exception as e:
+            print(f"✗ Error generating voice: {str(e)}")
+            return None
+
+    async def generate_voices_batch(self, texts: List[str], out_dir: str = "static/audio") -> List[str]:
+        """Synthesize several scripts concurrently.
+
+        Bounded at 5 in-flight requests to stay inside ElevenLabs rate
+        limits; total wall time is roughly one TTS call instead of N.
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        sem = asyncio.Semaphore(5)
+
+        async def one(index: int, text: str) -> str:
+            async with sem:
+                return await self.agenerate_voice(text, f"{out_dir}/vo_{index}.mp3")
+
+        return list(await asyncio.gather(*[one(i, t) for i, t in enumerate(texts)]))
+
+    async def agenerate_voice(self, text: str, output_filename: str = "voiceover.mp3") -> str:
+        """Async variant of generate_voice; safe to call from the event loop"""
+        url, headers, data = self._request_parts(text)
+
         try:
-            response = requests.post(url, json=data, headers=headers)
-            response.raise_for_status()
-            
-            with open(output_filename, 'wb') as f:
-                f.write(response.content)
-            
+            client = _get_async_client()
+            async with client.stream("POST", url, json=data, headers=headers) as response:
+                response.raise_for_status()
+                with open(output_filename, 'wb') as f:
+                    async for chunk in response.aiter_bytes(8192):
+                        f.write(chunk)
+
             print(f"✓ Voice generated and saved to {output_filename}")
             return output_filename
         except Exception as e:
@@ -0,0 +1,92 @@
+"""
+Offline bulk generation via the OpenAI Batch API
+
+For non-interactive jobs (nightly generation, historical catalogs) the
+Batch API costs half as much as realtime calls and isn't throttled by the
+realtime rate limits; results arrive within a 24h window. Interactive
+sessions keep using the streaming agents - this module is only for bulk.
+"""
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from openai import OpenAI
+
+from config import Config
+
+
+class BatchRunner:
+    """Submits chat-completion requests as one Batch API job and collects results"""
+
+    def __init__(self, poll_interval: float = 30):
+        self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
+        self.poll_interval = poll_interval
+
+    @staticmethod
+    def chat_request(custom_id: str, model: str, messages: List[Dict], **body) -> Dict:
+        """Build one line of the batch input JSONL"""
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {"model": model, "messages": messages, **body}
+        }
+
+    def submit(self, requests: List[Dict]) -> str:
+        """Upload the request JSONL and create the batch job"""
+        fd, path = tempfile.mkstemp(suffix=".jsonl")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                for request in requests:
+                    f.write(json.dumps(request) + "\n")
+            with open(path, 'rb') as f:
+                input_file = self.client.files.create(file=f, purpose="batch")
+        finally:
+            os.unlink(path)
+
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        print(f"✓ Submitted batch {batch.id} with {len(requests)} requests")
+        return batch.id
+
+    def wait(self, batch_id: str):
+        """Poll until the batch finishes (completed, failed, expired or cancelled)"""
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status in ("completed", "failed", "expired", "cancelled"):
+                print(f"Batch {batch_id} finished with status: {batch.status}")
+                return batch
+            print(f"Batch {batch_id} status: {batch.status}, waiting...")
+            time.sleep(self.poll_interval)
+
+    def fetch_results(self, batch_id: str) -> Dict[str, str]:
+        """Download the output JSONL and map custom_id -> completion text"""
+        batch = self.client.batches.retrieve(batch_id)
+        if not batch.output_file_id:
+            print(f"✗ Batch {batch_id} produced no output file (status: {batch.status})")
+            return {}
+
+        content = self.client.files.content(batch.output_file_id).text
+        results = {}
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            response = entry.get("response") or {}
+            if response.get("status_code") == 200:
+                choices = response["body"]["choices"]
+                results[entry["custom_id"]] = choices[0]["message"]["content"]
+            else:
+                print(f"✗ Batch request {entry.get('custom_id')} failed: {entry.get('error')}")
+        return results
+
+    def run(self, requests: List[Dict]) -> Dict[str, str]:
+        """Submit, wait for completion and return custom_id -> completion text"""
+        batch_id = self.submit(requests)
+        self.wait(batch_id)
+        return self.fetch_results(batch_id)
@@ -2,6 +2,9 @@ import os
 
 class Config:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+    # Cap on concurrent LLM requests across all agents (OpenAI RPM guard)
+    MAX_CONCURRENT_LLM_REQUESTS = int(os.getenv("MAX_CONCURRENT_LLM_REQUESTS", "32"))
     ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
     HEYGEN_API_KEY = os.getenv("HEYGEN_API_KEY")
     
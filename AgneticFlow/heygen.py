@@ -1,77 +1,266 @@
 from dotenv import load_dotenv
+import asyncio
 import os
+import random
 import requests
+import time
+from types import MappingProxyType
 from typing import List, Dict, Optional
 import mimetypes
+import httpx
 from config import Config
 
 load_dotenv()
 
+# HTTP/2 multiplexes concurrent HeyGen calls over one connection when the
+# optional h2 extra (httpx[http2]) is installed; fall back to HTTP/1.1
+try:
+    import h2  # noqa: F401
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+
+# Only a handful of extensions ever reach upload_asset; a dict lookup
+# beats walking the mimetypes database on every upload
+_EXT_TO_MIME = {
+    ".mp3": "audio/mpeg",
+    ".wav": "audio/x-wav",
+    ".m4a": "audio/mp4",
+    ".mp4": "video/mp4",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+}
+
+
+def _guess_mime(file_path: str) -> str:
+    """Resolve an upload's content type, preferring the static table"""
+    ext = os.path.splitext(file_path)[1].lower()
+    mime_type = _EXT_TO_MIME.get(ext)
+    if not mime_type:
+        mime_type, _ = mimetypes.guess_type(file_path)
+    return mime_type or "application/octet-stream"
+
+
+# Shared connections to the HeyGen API, mirroring audioGeneration: one
+# keep-alive pool for sync callers and one for async callers, instead of
+# a fresh TLS handshake per call
+_session = requests.Session()
+_async_client: Optional[httpx.AsyncClient] = None
+
+# The avatar catalog changes rarely; remember it for an hour so repeat
+# listings cost a dict read instead of a full-catalog round-trip
+_AVATAR_TTL = 3600
+_avatar_cache: Optional[List[Dict]] = None
+_avatar_cache_time = 0.0
+
+
+def _cached_avatars() -> Optional[List[Dict]]:
+    if _avatar_cache is not None and time.monotonic() - _avatar_cache_time < _AVATAR_TTL:
+        return _avatar_cache
+    return None
+
+
+def _store_avatars(avatars: List[Dict]) -> None:
+    global _avatar_cache, _avatar_cache_time
+    if avatars:
+        _avatar_cache = avatars
+        _avatar_cache_time = time.monotonic()
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            timeout=60,
+            http2=_HTTP2,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+        )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    """Close the shared pool on app shutdown so connections don't leak"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
 class HeyGenAvatarIntegrator:
     """Integrates voiceover with HeyGen avatar"""
-    
+
     def __init__(self):
-        self.api_key = "sk_V2_hgu_kFKikEzcc9J_vkOeLpbL9s30JB2N4cUc4LC1tiR5cXIh"
+        self.api_key = Config.HEYGEN_API_KEY
+        if not self.api_key:
+            print("WARNING: HEYGEN_API_KEY is not set in environment variables.")
+        # Static header mappings built once; read-only views keep the hot
+        # status-polling loop from re-allocating the same dicts per call
+        self._auth_headers = MappingProxyType({"X-Api-Key": self.api_key})
+        self._json_headers = MappingProxyType({
+            "X-Api-Key": self.api_key,
+            "Content-Type": "application/json"
+        })
+
 
-    
     def get_avatars(self) -> List[Dict]:
         """Fetch available avatars from HeyGen API"""
+        cached = _cached_avatars()
+        if cached is not None:
+            return cached
         url = f"{Config.HEYGEN_API_BASE_URL}/v2/avatars"
-        headers = {
-            "X-Api-Key": self.api_key
-        }
-        
         try:
-            response = requests.get(url, headers=headers)
+            response = _session.get(url, headers=self._auth_headers)
             response.raise_for_status()
             data = response.json()
-            return data.get("data", {}).get("avatars", [])
+            avatars = data.get("data", {}).get("avatars", [])
+            _store_avatars(avatars)
+            return avatars
         except Exception as e:
             print(f"✗ Error fetching avatars: {str(e)}")
             return []
 
-    def upload_asset(self, file_path: str) -> Optional[str]:
-        """Upload a local file to HeyGen and return the asset ID"""
+    async def aget_avatars(self) -> List[Dict]:
+        """Async variant of get_avatars; safe to call from the event loop"""
+        cached = _cached_avatars()
+        if cached is not None:
+            return cached
+        url = f"{Config.HEYGEN_API_BASE_URL}/v2/avatars"
+        try:
+            client = _get_async_client()
+            response = await client.get(url, headers=self._auth_headers)
+            response.raise_for_status()
+            data = response.json()
+            avatars = data.get("data", {}).get("avatars", [])
+            _store_avatars(avatars)
+            return avatars
+        except Exception as e:
+            print(f"✗ Error fetching avatars: {str(e)}")
+            return []
+
+    async def aupload_asset(self, file_path: str) -> Optional[str]:
+        """Async variant of upload_asset; safe to call from the event loop"""
         url = f"{Config.HEYGEN_UPLOAD_URL}"
-        mime_type, _ = mimetypes.guess_type(file_path)
-        if not mime_type:
-            mime_type = "application/octet-stream"
-            
+        mime_type = _guess_mime(file_path)
+
         headers = {
             "X-Api-Key": self.api_key,
-            "Content-Type": mime_type
+            "Content-Type": mime_type,
+            # Explicit length lets us stream the body in bounded chunks
+            # instead of buffering the whole file in memory first
+            "Content-Length": str(os.path.getsize(file_path))
         }
-        
+
         try:
-            with open(file_path, "rb") as f:
-                response = requests.post(url, headers=headers, data=f)
-                response.raise_for_status()
-                data = response.json()
-                asset_id = data.get("data", {}).get("id")
-                print(f"✓ Audio uploaded to HeyGen. Asset ID: {asset_id}")
-                return asset_id
+            client = _get_async_client()
+            response = await client.post(url, headers=headers, content=self._file_chunks(file_path))
+            response.raise_for_status()
+            data = response.json()
+            asset_id = data.get("data", {}).get("id")
+            print(f"✓ Audio uploaded to HeyGen. Asset ID: {asset_id}")
+            return asset_id
         except Exception as e:
             print(f"✗ Error uploading asset: {str(e)}")
             return None
 
-    def create_avatar_video(self, audio_input: str, avatar_id: str = "default", is_asset_id: bool = False) -> Dict:
-        """Create video with HeyGen avatar and audio (url or asset_id)"""
-        
-        headers = {
-            "X-Api-Key": self.api_key,
-            "Content-Type": "application/json"
+    async def acreate_avatar_video(self, audio_input: str, avatar_id: str = "default", is_asset_id: bool = False) -> Dict:
+        """Async variant of create_avatar_video; safe to call from the event loop"""
+        data = self._video_payload(audio_input, avatar_id, is_asset_id)
+
+        try:
+            client = _get_async_client()
+            response = await client.post(Config.HEYGEN_CREATE_VIDEO_URL, json=data, headers=self._json_headers)
+            response.raise_for_status()
+            result = response.json()
+
+            print(f"✓ Avatar video creation initiated")
+            video_id = result.get("data", {}).get("video_id")
+            print(f"  Video ID: {video_id}")
+
+            return {"video_id": video_id, "raw": result}
+
+        except Exception as e:
+            print(f"✗ Error creating avatar video: {str(e)}")
+            return {"error": str(e)}
+
+    async def acheck_video_status(self, video_id: str) -> Dict:
+        """Async variant of check_video_status; safe to call from the event loop"""
+        params = {
+            "video_id": video_id
         }
-        
+
+        try:
+            client = _get_async_client()
+            response = await client.get(Config.HEYGEN_STATUS_URL, params=params, headers=self._auth_headers)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+    async def await_video(self, video_id: str, max_wait: float = 600) -> Dict:
+        """Poll video status with exponential backoff until it finishes.
+
+        Starts at 2s, doubling up to a 60s cap with ±20% jitter, so a
+        long render costs O(log t) status calls instead of a fixed spin.
+        Returns the final status payload, or an error dict on timeout.
+        """
+        delay = 2.0
+        deadline = time.monotonic() + max_wait
+        while time.monotonic() < deadline:
+            result = await self.acheck_video_status(video_id)
+            status = result.get("data", {}).get("status")
+            if status in ("completed", "failed") or "error" in result:
+                return result
+            remaining = deadline - time.monotonic()
+            await asyncio.sleep(min(delay * random.uniform(0.8, 1.2), max(remaining, 0)))
+            delay = min(delay * 2, 60)
+        return {"error": f"Timed out after {max_wait}s waiting for video {video_id}"}
+
+    @staticmethod
+    async def _file_chunks(file_path: str, size: int = 1 << 20):
+        """Yield a file in 1 MiB chunks, reading on a worker thread.
+
+        Keeps peak memory at O(chunk size) for multi-MB audio uploads and
+        never blocks the event loop on disk I/O.
+        """
+        f = await asyncio.to_thread(open, file_path, "rb")
+        try:
+            while True:
+                chunk = await asyncio.to_thread(f.read, size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            await asyncio.to_thread(f.close)
+
+    # Immutable parts of the video-generation body, built once
+    _VIDEO_TEMPLATE = MappingProxyType({
+        "dimension": {
+            "width": 1280,
+            "height": 720
+        },
+        "aspect_ratio": "16:9"
+    })
+    # Plain dict (not a proxy) so the payload stays json-serializable
+    _BACKGROUND = {
+        "type": "color",
+        "value": "#FFFFFF"
+    }
+
+    @classmethod
+    def _video_payload(cls, audio_input: str, avatar_id: str, is_asset_id: bool) -> Dict:
+        """Build the video-generation request body"""
         voice_config = {
             "type": "audio",
         }
-        
         if is_asset_id:
             voice_config["audio_asset_id"] = audio_input
         else:
             voice_config["audio_url"] = audio_input
 
-        data = {
+        return {
+            **cls._VIDEO_TEMPLATE,
             "video_inputs": [{
                 "character": {
                     "type": "avatar",
@@ -79,23 +268,42 @@ class HeyGenAvatarIntegrator:
                     "avatar_style": "normal"
                 },
                 "voice": voice_config,
-                "background": {
-                    "type": "color",
-                    "value": "#FFFFFF"
-                }
+                "background": cls._BACKGROUND
             }],
-            "dimension": {
-                "width": 1280,
-                "height": 720
-            },
-            "aspect_ratio": "16:9"
+        }
+
+    def upload_asset(self, file_path: str) -> Optional[str]:
+        """Upload a local file to HeyGen and return the asset ID"""
+        url = f"{Config.HEYGEN_UPLOAD_URL}"
+        mime_type = _guess_mime(file_path)
+
+        headers = {
+            "X-Api-Key": self.api_key,
+            "Content-Type": mime_type
         }
         
         try:
-            response = requests.post(
+            with open(file_path, "rb") as f:
+                response = _session.post(url, headers=headers, data=f)
+                response.raise_for_status()
+                data = response.json()
+                asset_id = data.get("data", {}).get("id")
+                print(f"✓ Audio uploaded to HeyGen. Asset ID: {asset_id}")
+                return asset_id
+        except Exception as e:
+            print(f"✗ Error uploading asset: {str(e)}")
+            return None
+
+    def create_avatar_video(self, audio_input: str, avatar_id: str = "default", is_asset_id: bool = False) -> Dict:
+        """Create video with HeyGen avatar and audio (url or asset_id)"""
+        
+        data = self._video_payload(audio_input, avatar_id, is_asset_id)
+
+        try:
+            response = _session.post(
                 Config.HEYGEN_CREATE_VIDEO_URL,
                 json=data,
-                headers=headers
+                headers=self._json_headers
             )
             response.raise_for_status()
             result = response.json()
@@ -115,19 +323,15 @@ class HeyGenAvatarIntegrator:
     def check_video_status(self, video_id: str) -> Dict:
         """Check the status of video generation"""
         
-        headers = {
-            "X-Api-Key": self.api_key
-        }
-        
         params = {
             "video_id": video_id
         }
         
         try:
-            response = requests.get(
+            response = _session.get(
                 Config.HEYGEN_STATUS_URL,
                 params=params,
-                headers=headers
+                headers=self._auth_headers
             )
             response.raise_for_status()
             return response.json()
@@ -8,16 +8,69 @@ from urllib.parse import urljoin
 from io import BytesIO
 from dotenv import load_dotenv
 import uuid
+import re
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Load environment variables
 load_dotenv()
 
+# lxml is a C-extension parser, typically several times faster than the
+# pure-Python html.parser; fall back when the extra isn't installed
+try:
+    import lxml  # noqa: F401
+    _SOUP_PARSER = 'lxml'
+except ImportError:
+    _SOUP_PARSER = 'html.parser'
+
+# Shared keep-alive connection pool: the page fetch and every image
+# download hit the same host, so TLS handshakes are paid once
+_session = requests.Session()
+
+# Scrapes repeat for the same product across the workflow (reference image
+# per generation call), so keep fetched bytes keyed by URL and skip the
+# network entirely on revisits. Entries expire after a day (same policy as
+# scraper.py's page cache) and each dict is bounded so a long-running
+# server can't accumulate page HTML and raw image bytes forever.
+_PAGE_CACHE = {}
+_IMAGE_CACHE = {}
+_CACHE_TTL = 86400
+_PAGE_CACHE_MAX = 16
+_IMAGE_CACHE_MAX = 128
+
+
+def _cache_get(cache, key):
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    value, stored_at = entry
+    if time.time() - stored_at > _CACHE_TTL:
+        del cache[key]
+        return None
+    return value
+
+
+def _cache_set(cache, key, value, max_entries):
+    if len(cache) >= max_entries:
+        # Dicts iterate in insertion order: drop the oldest entry
+        del cache[next(iter(cache))]
+    cache[key] = (value, time.time())
+
+# Compiled once: one case-insensitive scan per URL instead of lowercasing
+# the whole string and running four substring searches
+_IMG_EXT_RE = re.compile(r'\.(?:jpe?g|png|webp)(?:$|[?#])', re.I)
+
+
 class ImageGenerator:
     def __init__(self):
         self.client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
         self.save_dir = "static/generated_images"
         if not os.path.exists(self.save_dir):
             os.makedirs(self.save_dir)
+        # Content hash -> saved URL, so identical model outputs across
+        # alterations reuse one file instead of re-encoding a duplicate
+        self._saved_hashes = {}
 
     def scrape_product_images(self, product_url, limit=3):
         """
@@ -29,47 +82,86 @@ class ImageGenerator:
         scraped_images = []
         
         try:
-            response = requests.get(product_url, headers=headers, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
+            page_html = _cache_get(_PAGE_CACHE, product_url)
+            if page_html is None:
+                response = _session.get(product_url, headers=headers, timeout=10)
+                response.raise_for_status()
+                page_html = response.text
+                _cache_set(_PAGE_CACHE, product_url, page_html, _PAGE_CACHE_MAX)
+            soup = BeautifulSoup(page_html, _SOUP_PARSER)
             
-            # Find all image tags
+            # Find all image tags and collect candidate URLs up front
             img_tags = soup.find_all('img')
-            
-            count = 0
-            
+
+            candidate_urls = []
             for img in img_tags:
                 img_url = img.get('src')
                 if not img_url:
                     continue
-                    
+
                 # Handle relative URLs
                 img_url = urljoin(product_url, img_url)
-                
+
                 # Simple filter for product-like images
-                if not any(ext in img_url.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp']):
+                if not _IMG_EXT_RE.search(img_url):
                     continue
+                candidate_urls.append(img_url)
+
+            # Some candidates fail to download or verify; fetch a small
+            # multiple of the limit rather than every tag on the page
+            candidate_urls = candidate_urls[:limit * 8]
 
+            def download(img_url):
+                cached = _cache_get(_IMAGE_CACHE, img_url)
+                if cached is not None:
+                    return cached
                 try:
-                    img_data = requests.get(img_url, headers=headers, timeout=10).content
-                    
-                    # Verify it's a valid image
+                    # Cheap HEAD first: most candidates are tracking pixels,
+                    # sprites or logos, and the headers alone rule them out
+                    # without paying for the body
                     try:
-                        image = Image.open(BytesIO(img_data))
-                        image.verify()
-                        # Re-open because verify() closes the file
-                        image = Image.open(BytesIO(img_data))
-                        scraped_images.append(image)
-                        count += 1
+                        head = _session.head(img_url, headers=headers, timeout=10, allow_redirects=True)
+                        content_type = head.headers.get('Content-Type', '')
+                        content_length = head.headers.get('Content-Length')
+                        if content_type and not content_type.startswith('image/'):
+                            return None
+                        # Only trust the size gate when the header is present;
+                        # many CDNs omit it on HEAD
+                        if content_length is not None and int(content_length) < 20_000:
+                            return None
                     except Exception:
-                        continue
-                    
-                    if count >= limit:
-                        break
-                        
+                        # Host rejects HEAD: fall through to the full GET
+                        pass
+
+                    img_data = _session.get(img_url, headers=headers, timeout=10).content
+                    _cache_set(_IMAGE_CACHE, img_url, img_data, _IMAGE_CACHE_MAX)
+                    return img_data
                 except Exception as e:
                     print(f"Failed to download {img_url}: {e}")
-                    
+                    return None
+
+            # Downloads are RTT-bound, so fetch them in one concurrent wave
+            # (capped at 8 workers to stay a polite scraper) instead of one
+            # sequential request per tag
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                downloads = list(pool.map(download, candidate_urls))
+
+            for img_data in downloads:
+                if not img_data:
+                    continue
+                # Verify it's a valid image: load() forces a full decode
+                # and leaves a usable object, unlike the verify()+reopen
+                # two-step which parsed every image twice
+                try:
+                    image = Image.open(BytesIO(img_data))
+                    image.load()
+                    scraped_images.append(image)
+                except Exception:
+                    continue
+
+                if len(scraped_images) >= limit:
+                    break
+
             print(f"Scraped {len(scraped_images)} images.")
             return scraped_images
             
@@ -77,6 +169,72 @@ class ImageGenerator:
             print(f"Error scraping URL: {e}")
             return []
 
+    def _generate_one_alteration(self, prompt, original_image):
+        """
+        Runs a single Gemini generation call and saves any returned images.
+        Returns a list of web URLs (usually one, candidate_count=1).
+        """
+        urls = []
+        response = self.client.models.generate_content(
+            model="gemini-2.5-flash-image",
+            contents=[prompt, original_image],
+            config=types.GenerateContentConfig(candidate_count=1)
+        )
+
+        if response.parts:
+            for part in response.parts:
+                if part.inline_data:
+                    # Dedupe on the raw bytes before any decode: identical
+                    # outputs reuse the already-saved file
+                    raw_bytes = part.inline_data.data
+                    if raw_bytes:
+                        content_hash = hashlib.blake2b(raw_bytes, digest_size=16).hexdigest()
+                        cached_url = self._saved_hashes.get(content_hash)
+                        if cached_url:
+                            urls.append(cached_url)
+                            print(f"Reusing identical alteration: {cached_url}")
+                            continue
+                    else:
+                        content_hash = None
+
+                    generated_image = part.as_image()
+
+                    # Save to static directory
+                    filename = f"ad_creative_{uuid.uuid4()}.png"
+                    filepath = os.path.join(self.save_dir, filename)
+                    generated_image.save(filepath)
+
+                    # URL relative to server root (assuming static is mounted at /static)
+                    # Note: server.py mounts "static" dir to "/static" path
+                    # filepath is "static/generated_images/..."
+                    # url should be "/static/generated_images/..."
+
+                    # Windows path separator fix
+                    web_path = filepath.replace(os.sep, '/')
+                    urls.append(f"/{web_path}")
+                    if content_hash:
+                        self._saved_hashes[content_hash] = f"/{web_path}"
+                    print(f"Saved alteration: {filepath}")
+        return urls
+
+    def _generate_alterations(self, prompt, original_image, num_alterations):
+        """
+        Issues the N multi-second Gemini calls concurrently instead of
+        sequentially, so latency is ~one call rather than N of them.
+        """
+        generated_urls = []
+        with ThreadPoolExecutor(max_workers=max(num_alterations, 1)) as pool:
+            futures = [
+                pool.submit(self._generate_one_alteration, prompt, original_image)
+                for _ in range(num_alterations)
+            ]
+            for future in futures:
+                try:
+                    generated_urls.extend(future.result())
+                except Exception as e:
+                    print(f"Error generating alterations: {e}")
+        return generated_urls
+
     def generate_ad_creatives(self, product_url, script_content, num_alterations=2):
         """
         Generates ad creatives based on the product URL and script content.
@@ -84,16 +242,16 @@ class ImageGenerator:
         """
         # 1. Scrape images (we need at least one reference image)
         images = self.scrape_product_images(product_url, limit=1)
-        
+
         if not images:
             print("No product images found to use as reference.")
             return []
-            
+
         original_image = images[0]
-        
+
         # 2. Generate alterations
         print(f"Generating {num_alterations} alterations...")
-        
+
         prompt = (
             f"Create a professional commercial advertisement static featuring this product. "
             f"Context from ad script: '{script_content[:200]}...'. "
@@ -101,68 +259,9 @@ class ImageGenerator:
             "Ensure the product remains the focal point. "
             "Style: Modern, Premium, Commercial Photography."
         )
-        
-        generated_urls = []
-        
-        try:
-            # Generate content
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash-image",
-                contents=[prompt, original_image],
-                config=types.GenerateContentConfig(
-                    candidate_count=1 
-                )
-            )
-            
-            if response.parts:
-                for i, part in enumerate(response.parts):
-                    if part.inline_data:
-                        generated_image = part.as_image()
-                        
-                        # Save to static directory
-                        filename = f"ad_creative_{uuid.uuid4()}.png"
-                        filepath = os.path.join(self.save_dir, filename)
-                        generated_image.save(filepath)
-                        
-                        # URL relative to server root (assuming static is mounted at /static)
-                        # Note: server.py mounts "static" dir to "/static" path
-                        # filepath is "static/generated_images/..."
-                        # url should be "/static/generated_images/..."
-                        
-                        # Windows path separator fix
-                        web_path = filepath.replace(os.sep, '/')
-                        generated_urls.append(f"/{web_path}")
-                        print(f"Saved alteration: {filepath}")
-                        
-            # If we need more than 1 and the model only returns 1 per call, loop
-            # For now, let's just do one call as per the original script logic which seemed to imply one call or loop.
-            # The original script had a loop over response.parts, but candidate_count=1.
-            # If we want multiple, we might need multiple calls if candidate_count > 1 isn't supported or reliable.
-            
-            if len(generated_urls) < num_alterations:
-                 # Simple loop for remaining
-                 for _ in range(num_alterations - len(generated_urls)):
-                    response = self.client.models.generate_content(
-                        model="gemini-2.5-flash-image",
-                        contents=[prompt, original_image],
-                        config=types.GenerateContentConfig(candidate_count=1)
-                    )
-                    if response.parts:
-                        for part in response.parts:
-                            if part.inline_data:
-                                generated_image = part.as_image()
-                                filename = f"ad_creative_{uuid.uuid4()}.png"
-                                filepath = os.path.join(self.save_dir, filename)
-                                generated_image.save(filepath)
-                                web_path = filepath.replace(os.sep, '/')
-                                generated_urls.append(f"/{web_path}")
-
-            return generated_urls
 
-        except Exception as e:
-            print(f"Error generating alterations: {e}")
-            return []
-    
+        return self._generate_alterations(prompt, original_image, num_alterations)
+
     def generate_ad_creatives_with_prompt(self, product_url, custom_prompt, num_alterations=2):
         """
         Generates ad creatives using a custom prompt (from agent).
@@ -170,43 +269,14 @@ class ImageGenerator:
         """
         # 1. Scrape images (we need at least one reference image)
         images = self.scrape_product_images(product_url, limit=1)
-        
+
         if not images:
             print("No product images found to use as reference.")
             return []
-            
+
         original_image = images[0]
-        
+
         # 2. Generate using custom prompt
         print(f"Generating {num_alterations} images with custom prompt...")
-        
-        generated_urls = []
-        
-        try:
-            # Generate content with custom prompt
-            for _ in range(num_alterations):
-                response = self.client.models.generate_content(
-                    model="gemini-2.5-flash-image",
-                    contents=[custom_prompt, original_image],
-                    config=types.GenerateContentConfig(candidate_count=1)
-                )
-                
-                if response.parts:
-                    for part in response.parts:
-                        if part.inline_data:
-                            generated_image = part.as_image()
-                            
-                            # Save to static directory
-                            filename = f"ad_creative_{uuid.uuid4()}.png"
-                            filepath = os.path.join(self.save_dir, filename)
-                            generated_image.save(filepath)
-                            
-                            web_path = filepath.replace(os.sep, '/')
-                            generated_urls.append(f"/{web_path}")
-                            print(f"Saved image: {filepath}")
-
-            return generated_urls
 
-        except Exception as e:
-            print(f"Error generating images with custom prompt: {e}")
-            return []
\ No newline at end of file
+        return self._generate_alterations(custom_prompt, original_image, num_alterations)
\ No newline at end of file
@@ -15,16 +15,13 @@ from elevenlabs.play import play
 load_dotenv()
 from config import Config
 from orchestrator import AdCampaignAgent
+
+REQUIRED_KEYS = ("OPENAI_API_KEY", "ELEVENLABS_API_KEY", "HEYGEN_API_KEY")
+
 def main():
     """Entry point"""
-    
-    required_keys = {
-        "OPENAI_API_KEY": Config.OPENAI_API_KEY,
-        "ELEVENLABS_API_KEY": Config.ELEVENLABS_API_KEY,
-        "HEYGEN_API_KEY": Config.HEYGEN_API_KEY
-    }
-    
-    missing_keys = [k for k, v in required_keys.items() if not v]
+
+    missing_keys = [k for k in REQUIRED_KEYS if not os.environ.get(k)]
     
     if missing_keys:
         print("⚠️  Warning: Missing API keys:")
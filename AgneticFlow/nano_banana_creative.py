@@ -6,19 +6,63 @@ from google.genai import types
 # from google import types
 from PIL import Image
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 import os
 from urllib.parse import urljoin
 from io import BytesIO
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
 
 
 # Load environment variables
 load_dotenv()
 
+# lxml is a C-extension parser, typically several times faster than the
+# pure-Python html.parser; fall back when the extra isn't installed
+try:
+    import lxml  # noqa: F401
+    _SOUP_PARSER = 'lxml'
+except ImportError:
+    _SOUP_PARSER = 'html.parser'
+
 # Initialize the GenAI client (referred to as "Nano Banana" in user context)
 client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
 
+# One pooled keep-alive session for the page fetch and every image fetch:
+# the TLS handshake to the product host is paid once, with light retries
+# for flaky CDNs
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(total=2, backoff_factor=0.3)
+)
+SESSION.mount('https://', _adapter)
+SESSION.mount('http://', _adapter)
+SESSION.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'})
+
+# Streaming-download guards: drop decorative monsters early and tiny
+# icons as soon as the header chunk reveals their dimensions
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+MIN_DIMENSION = 200
+
+
+def _is_image(data):
+    """Magic-byte check for the formats the scraper accepts.
+
+    A handful of prefix comparisons replaces Pillow's verify(), which
+    walks the whole byte stream per image; corrupt files past the header
+    still surface later when the ad-generation step actually decodes.
+    """
+    return (
+        data[:3] == b'\xff\xd8\xff'                          # JPEG
+        or data[:8] == b'\x89PNG\r\n\x1a\n'                  # PNG
+        or (data[:4] == b'RIFF' and data[8:12] == b'WEBP')   # WEBP
+        or data[:6] in (b'GIF87a', b'GIF89a')                # GIF
+    )
+
 def scrape_product_images(product_url, save_dir="scraped_products"):
     """
     Scrapes images from a given product URL and saves them locally.
@@ -27,57 +71,109 @@ def scrape_product_images(product_url, save_dir="scraped_products"):
         os.makedirs(save_dir)
     
     print(f"Scraping images from {product_url}...")
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-    
+
     try:
-        response = requests.get(product_url, headers=headers)
+        response = SESSION.get(product_url)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(response.content, _SOUP_PARSER)
         
-        # Find all image tags
+        # Find all image tags and collect candidate URLs up front
         img_tags = soup.find_all('img')
-        
-        saved_images = []
-        count = 0
-        
+
+        candidate_urls = []
         for img in img_tags:
             img_url = img.get('src')
             if not img_url:
                 continue
-                
+
             # Handle relative URLs
             img_url = urljoin(product_url, img_url)
-            
+
             # Simple filter for product-like images (ignoring small icons/tracking pixels)
             # This is a basic heuristic; in production, use size checking or more advanced filtering
             if not any(ext in img_url.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp']):
                 continue
+            candidate_urls.append(img_url)
+
+        # Some candidates fail to download or verify; fetch a few spares
+        # beyond the 3 we keep rather than every tag on the page
+        candidate_urls = candidate_urls[:24]
 
+        def download(img_url):
             try:
-                img_data = requests.get(img_url, headers=headers, timeout=10).content
-                
-                # Verify it's a valid image
+                # Cheap HEAD first: tracking pixels, sprites and icons are
+                # ruled out by the headers alone without paying for the body
                 try:
-                    Image.open(BytesIO(img_data)).verify()
+                    head = SESSION.head(img_url, timeout=10, allow_redirects=True)
+                    content_type = head.headers.get('Content-Type', '')
+                    content_length = head.headers.get('Content-Length')
+                    if content_type and not content_type.startswith('image/'):
+                        return None
+                    # Only trust the size gate when the header is present;
+                    # many CDNs omit it on HEAD
+                    if content_length is not None and int(content_length) < 10240:
+                        return None
                 except Exception:
-                    continue
-                
-                filename = f"product_{count}.jpg"
-                filepath = os.path.join(save_dir, filename)
-                
-                with open(filepath, 'wb') as f:
-                    f.write(img_data)
-                
-                saved_images.append(filepath)
-                count += 1
-                
-                # Limit to 3 images for PoC
-                if count >= 3:
-                    break
-                    
+                    # Host rejects HEAD: fall through to the full GET
+                    pass
+
+                # Stream the body so rejected assets can be aborted
+                # mid-transfer instead of buffered whole
+                with SESSION.get(img_url, timeout=10, stream=True) as r:
+                    r.raise_for_status()
+                    buf = bytearray()
+                    first_chunk = True
+                    for chunk in r.iter_content(65536):
+                        buf += chunk
+                        if first_chunk:
+                            first_chunk = False
+                            # Image.open on the header chunk parses
+                            # dimensions without decoding pixels; partial
+                            # data that can't be parsed yet just streams on
+                            try:
+                                width, height = Image.open(BytesIO(bytes(buf))).size
+                                if width < MIN_DIMENSION or height < MIN_DIMENSION:
+                                    return None
+                            except Exception:
+                                pass
+                        if len(buf) > MAX_IMAGE_BYTES:
+                            print(f"Aborting oversized download: {img_url}")
+                            return None
+                    return bytes(buf)
             except Exception as e:
                 print(f"Failed to download {img_url}: {e}")
-                
+                return None
+
+        # Downloads are RTT-bound, so fetch them in one concurrent wave
+        # (capped at 8 workers to stay a polite scraper)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            downloads = list(pool.map(download, candidate_urls))
+
+        saved_images = []
+        count = 0
+
+        for img_data in downloads:
+            if not img_data:
+                continue
+
+            # Verify it's a valid image by signature; the bytes are saved
+            # raw, so nothing here needs a full decode
+            if not _is_image(img_data):
+                continue
+
+            filename = f"product_{count}.jpg"
+            filepath = os.path.join(save_dir, filename)
+
+            with open(filepath, 'wb') as f:
+                f.write(img_data)
+
+            saved_images.append(filepath)
+            count += 1
+
+            # Limit to 3 images for PoC
+            if count >= 3:
+                break
+
         print(f"Scraped {len(saved_images)} images.")
         return saved_images
         
@@ -104,32 +200,32 @@ def create_ad_alterations(image_path, num_alterations=2):
         
         # Generate content
         # Note: Using the model ID from the original file
+        # One call with candidate_count=N: the server produces all variants
+        # in a single forward pass instead of N round trips
         response = client.models.generate_content(
             model="gemini-2.5-flash-image",
             contents=[prompt, original_image],
             config=types.GenerateContentConfig(
-                candidate_count=1 # Generate one at a time for control, or increase if supported
+                candidate_count=num_alterations
             )
         )
-        
+
         generated_files = []
-        
-        # Handle response
-        if response.parts:
-            for i, part in enumerate(response.parts):
+
+        # Handle response: each candidate carries its own parts
+        for cand_idx, candidate in enumerate(response.candidates or []):
+            parts = candidate.content.parts if candidate.content else []
+            for part in parts or []:
                 # Check for inline data (image)
                 if part.inline_data:
                     generated_image = part.as_image()
-                    output_filename = f"{os.path.splitext(image_path)[0]}_ad_{i+1}.png"
+                    output_filename = f"{os.path.splitext(image_path)[0]}_ad_{cand_idx+1}.png"
                     generated_image.save(output_filename)
                     generated_files.append(output_filename)
                     print(f"Saved alteration: {output_filename}")
                 elif part.text:
                     print(f"Model returned text: {part.text}")
-                    
-        # If the model supports generating multiple candidates in one go, we might need to adjust loop
-        # For this PoC, we'll just run the loop if we need distinct variations and the API returns 1
-        
+
         return generated_files
 
     except Exception as e:
@@ -144,10 +240,20 @@ def main(product_url):
         print("No images found to process.")
         return
 
-    # 2. Generate Alterations for the first scraped image (best candidate usually)
-    # Using "Nano Banana" (GenAI) to create alterations
-    best_image = scraped_images[0]
-    create_ad_alterations(best_image, num_alterations=3)
+    # 2. Generate Alterations for every scraped image
+    # Using "Nano Banana" (GenAI) to create alterations; each call is a
+    # blocking HTTPS request, so run them concurrently and let wall time
+    # track the slowest generation instead of the sum
+    with ThreadPoolExecutor(max_workers=min(4, len(scraped_images))) as pool:
+        futures = [
+            pool.submit(create_ad_alterations, image_path, 3)
+            for image_path in scraped_images
+        ]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error generating alterations: {e}")
 
 target_url = "https://www.nike.com/t/air-force-1-07-mens-shoes-jBrhbr/CW2288-111" 
 main(target_url)
\ No newline at end of file
@@ -1,5 +1,6 @@
 from dotenv import load_dotenv
 import os
+import sys
 import requests
 from bs4 import BeautifulSoup
 from typing import List, Dict, Optional
@@ -15,34 +16,184 @@ from elevenlabs.client import ElevenLabs
 from elevenlabs.play import play
 load_dotenv()
 from config import Config
+from agents import get_llm, _extract_json, RESPONSE_CACHE
+import atexit
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Compiled once at import; _parse_scripts runs per LLM response and skips
+# the re-cache lookup and pattern dispatch on every call
+_SCRIPT_RE = re.compile(
+    r'SCRIPT\s*(?:\[?\d+\]?)?:?(.*?)(?=SCRIPT\s*(?:\[?\d+\]?)?:?|$)',
+    re.DOTALL | re.IGNORECASE
+)
+_TRAIL_DASH_RE = re.compile(r'-+$')
+_WS_RE = re.compile(r'\s+')
+
+
+def _compact(text: str, max_chars: int = 1500) -> str:
+    """Collapse whitespace runs and clip to max_chars.
+
+    Scraped raw_text comes from soup.get_text() and is mostly newline and
+    indent runs; collapsing them roughly halves the prompt tokens spent on
+    page context without losing any words the model could use.
+    """
+    return _WS_RE.sub(' ', text).strip()[:max_chars]
+
+
+def _stream_text(chain, inputs: Dict) -> str:
+    """Run a chain, echoing tokens to the terminal as they arrive.
+
+    The interactive loops read much faster when text appears at
+    time-to-first-token instead of after the whole completion.
+    """
+    buf = []
+    for chunk in chain.stream(inputs):
+        buf.append(chunk)
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
+    print()
+    return ''.join(buf)
+
+
+def _cache_key(prefix: str, *parts) -> str:
+    """Stable cache key from the inputs that shape an LLM call"""
+    digest = hashlib.sha256(
+        json.dumps(parts, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"{prefix}:{digest}"
 
 class ProductAnalyzer:
     """Analyzes product data using LangChain and OpenAI with interactive feedback"""
-    
+
+    # Prompt templates are parsed once at class definition instead of on
+    # every call; combined with the shared LLM client the compiled chains
+    # below are allocated once per instance
+    ANALYSIS_PROMPT = ChatPromptTemplate.from_messages([
+        ("system", "You are an expert marketing analyst specializing in product analysis and target audience identification."),
+        ("human", """
+Analyze this product and provide a detailed analysis:
+
+Product Name: {title}
+Description: {description}
+Price: {price}
+Additional Context: {raw_text}
+
+Provide:
+1. Product Category and Key Features
+2. Target Audience (demographics, psychographics, pain points)
+3. Unique Selling Propositions (USPs)
+4. Marketing Angles and Emotional Triggers
+5. Competitive Positioning
+
+Format as JSON with keys: category, features, target_audience, usps, marketing_angles, positioning
+""")
+    ])
+
+    SCRIPT_PROMPT = ChatPromptTemplate.from_messages([
+        ("system", "You are a creative copywriter specializing in short-form video ad scripts for social media."),
+        ("human", """
+Create 3 unique short-form video ad scripts (30-45 seconds each) for this product:
+
+Product: {title}
+Target Audience: {target_audience}
+USPs: {usps}
+Marketing Angles: {marketing_angles}
+
+Each script should:
+- Hook viewers in the first 3 seconds
+- Address a pain point or desire
+- Highlight key benefits
+- Include a clear call-to-action
+- Be conversational and engaging
+- Use AIDA framework (Attention, Interest, Desire, Action)
+
+Format each script with:
+SCRIPT [1/2/3]:
+[Script content - spoken word only, 30-45 seconds when read aloud, around 100 words max.]
+---
+
+Make each script distinctly different in approach (problem-solution, testimonial-style, lifestyle-focused).
+Output only the voice over without additional commentary.
+""")
+    ])
+
+    TWEAK_PROMPT = ChatPromptTemplate.from_messages([
+        ("system", "You are a creative copywriter. Modify the script based on specific user requests while maintaining effectiveness."),
+        ("human", """
+Current Script:
+{current_script}
+
+User Request: {feedback}
+
+Provide the modified script (30-45 seconds when read aloud). Output only the script content without labels or commentary.
+""")
+    ])
+
     def __init__(self):
-        self.llm = ChatOpenAI(
-            model="gpt-4",
-            temperature=0.7,
-            openai_api_key=Config.OPENAI_API_KEY
-        )
+        # Shared per-process clients (see agents.get_llm) so repeated
+        # ProductAnalyzer construction reuses one warm connection pool.
+        # Initial generations carry the quality; refinements and tweaks
+        # apply small deltas to existing text and run on the much faster,
+        # cheaper mini model.
+        # max_tokens caps bound worst-case decode latency: generation
+        # scales with output length, and the prompts already ask for
+        # ~100-word scripts. 600 covers three scripts plus labels, 400 a
+        # single tweaked script. Analysis stays uncapped — a truncated
+        # json_object reply is unparseable, so a cap there turns rich
+        # analyses into raw-text fallbacks.
+        self.llm = get_llm("gpt-4o", temperature=0.7, max_tokens=600)
+        self.tweak_llm = get_llm("gpt-4o-mini", temperature=0.7, max_tokens=400)
+        # Analysis chains want strict JSON back (json_object mode)
+        self.analysis_llm = get_llm("gpt-4o", temperature=0.7, json_mode=True)
+        self.fast_analysis_llm = get_llm("gpt-4o-mini", temperature=0.7, json_mode=True)
+        # Script refinement returns all three scripts as one JSON object,
+        # so a single round trip replaces per-script regex re-parsing
+        self.fast_json_llm = get_llm("gpt-4o-mini", temperature=0.7, json_mode=True, max_tokens=600)
+        self.analysis_chain = self.ANALYSIS_PROMPT | self.analysis_llm | StrOutputParser()
+        self.script_chain = self.SCRIPT_PROMPT | self.llm | StrOutputParser()
+        self.tweak_chain = self.TWEAK_PROMPT | self.tweak_llm | StrOutputParser()
         self.analysis_memory = []
         self.script_memory = []
+        # Refinements run as rolling message threads (system context once,
+        # then alternating model replies and user feedback): each turn
+        # appends only the feedback delta, and the unchanged prefix hits
+        # the provider's prompt cache instead of being re-templated and
+        # re-billed at full price. Threads are keyed by the serialized
+        # state they end on, not held as singletons: server.py shares one
+        # analyzer across all HTTP sessions, and a turn pops its thread
+        # for the duration of the LLM await so concurrent sessions can
+        # never append onto each other's conversation.
+        self._analysis_threads = {}
+        self._script_threads = {}
+        # Memoized pretty-print of the last displayed analysis, keyed by
+        # object identity (refinements always build a new dict)
+        self._last_render_id = None
+        self._last_render = None
+        # Speculative script generation: while the user reads the analysis
+        # and types 'confirm', scripts for that analysis are already being
+        # generated in the background. Single worker — at most one guess
+        # in flight, keyed by the analysis it was computed from.
+        self._script_executor = ThreadPoolExecutor(max_workers=1)
+        self._pending_scripts = None
+        self._pending_analysis_id = None
+        # Drop any still-queued guess at interpreter exit so a worker
+        # draining a stale call can't hold up shutdown
+        atexit.register(self._script_executor.shutdown, wait=False, cancel_futures=True)
     
     def _parse_scripts(self, text: str) -> List[str]:
         """Parse scripts from LLM output using regex"""
-        # Pattern to match SCRIPT [N]: or SCRIPT N: followed by content
-        # We look for "SCRIPT" followed by optional brackets/numbers/colon
-        # Then capture everything until the next "SCRIPT" or end of string
-        pattern = r'SCRIPT\s*(?:\[?\d+\]?)?:?(.*?)(?=SCRIPT\s*(?:\[?\d+\]?)?:?|$)'
-        
-        matches = re.findall(pattern, text, re.DOTALL | re.IGNORECASE)
-        
+        # Pattern matches SCRIPT [N]: or SCRIPT N: followed by content,
+        # capturing everything until the next "SCRIPT" or end of string
+        matches = _SCRIPT_RE.findall(text)
+
         # Clean up matches
         scripts = []
         for match in matches:
             cleaned = match.strip()
             # Remove trailing dashes if present
-            cleaned = re.sub(r'-+$', '', cleaned).strip()
+            cleaned = _TRAIL_DASH_RE.sub('', cleaned).strip()
             if cleaned:
                 scripts.append(cleaned)
                 
@@ -72,7 +223,8 @@ class ProductAnalyzer:
         # Initial analysis
         analysis = self._generate_analysis(product_data, [])
         self._display_analysis(analysis)
-        
+        self._prefetch_scripts(product_data, analysis)
+
         # Feedback loop
         iteration = 1
         while True:
@@ -96,100 +248,193 @@ class ProductAnalyzer:
             print(f"\n🔄 Refining analysis based on your feedback...")
             analysis = self._refine_analysis(product_data, user_input, analysis)
             self._display_analysis(analysis)
-            
+            # Re-speculate against the refined analysis; the stale guess
+            # is simply ignored when its key no longer matches
+            self._prefetch_scripts(product_data, analysis)
+
             iteration += 1
     
-    def _generate_analysis(self, product_data: Dict, conversation_history: List) -> Dict:
-        """Generate initial product analysis"""
-        
-        analysis_prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are an expert marketing analyst specializing in product analysis and target audience identification."),
-            ("human", """
-Analyze this product and provide a detailed analysis:
-
-Product Name: {title}
-Description: {description}
-Price: {price}
-Additional Context: {raw_text}
+    def _prefetch_scripts(self, product_data: Dict, analysis: Dict):
+        """Kick off script generation in the background for this analysis.
 
-Provide:
-1. Product Category and Key Features
-2. Target Audience (demographics, psychographics, pain points)
-3. Unique Selling Propositions (USPs)
-4. Marketing Angles and Emotional Triggers
-5. Competitive Positioning
+        Most users confirm the analysis unchanged, so by the time they
+        type 'confirm' the scripts are usually done. A refined analysis
+        makes the guess stale and it is discarded.
+        """
+        if self._pending_scripts is not None:
+            # Cancel the stale guess: if it hasn't started yet this costs
+            # nothing, and a run already in flight can't be interrupted —
+            # it finishes and merely warms the response cache
+            self._pending_scripts.cancel()
+        self._pending_analysis_id = id(analysis)
+        self._pending_scripts = self._script_executor.submit(
+            self._generate_scripts, product_data, analysis, [], False
+        )
 
-Format as JSON with keys: category, features, target_audience, usps, marketing_angles, positioning
-""")
-        ])
-        
-        chain = analysis_prompt | self.llm | StrOutputParser()
-        
-        result = chain.invoke({
+    @staticmethod
+    def _analysis_inputs(product_data: Dict) -> Dict:
+        return {
             "title": product_data.get('title', ''),
             "description": product_data.get('description', ''),
             "price": product_data.get('price', ''),
-            "raw_text": product_data.get('raw_text', '')
-        })
-        
+            "raw_text": _compact(product_data.get('raw_text', ''))
+        }
+
+    @staticmethod
+    def _parse_analysis(result: str) -> Optional[Dict]:
+        """Parse a JSON analysis reply; None when nothing salvageable"""
         try:
             return json.loads(result)
-        except:
-            return {"analysis": result}
+        except json.JSONDecodeError:
+            # json_object mode makes this rare; salvage fenced output
+            # before giving up
+            try:
+                return _extract_json(result)
+            except (ValueError, json.JSONDecodeError):
+                return None
+
+    def _generate_analysis(self, product_data: Dict, conversation_history: List) -> Dict:
+        """Generate initial product analysis"""
+
+        inputs = self._analysis_inputs(product_data)
+
+        # Same product, same prompt -> same analysis; skip the multi-second
+        # GPT round-trip on repeats (refinements stay uncached since they
+        # depend on live feedback)
+        cache_key = _cache_key("pa_analysis", inputs)
+        cached = RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
+        result = self.analysis_chain.invoke(inputs)
+
+        parsed = self._parse_analysis(result)
+        if parsed is not None:
+            RESPONSE_CACHE.set(cache_key, parsed)
+            return parsed
+        return {"analysis": result}
+
+    async def _agenerate_analysis(self, product_data: Dict, conversation_history: List) -> Dict:
+        """Async twin of _generate_analysis for server-side callers.
+
+        ainvoke keeps the multi-second OpenAI round trip off the event
+        loop, so FastAPI handlers stay responsive and independent calls
+        can overlap via asyncio.gather.
+        """
+        inputs = self._analysis_inputs(product_data)
+
+        cache_key = _cache_key("pa_analysis", inputs)
+        cached = RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
+        result = await self.analysis_chain.ainvoke(inputs)
+
+        parsed = self._parse_analysis(result)
+        if parsed is not None:
+            RESPONSE_CACHE.set(cache_key, parsed)
+            return parsed
+        return {"analysis": result}
     
+    # Bound on remembered refinement threads; beyond this the oldest
+    # conversation is forgotten and simply reseeds on its next turn
+    _MAX_THREADS = 32
+
+    @classmethod
+    def _file_thread(cls, threads: Dict, key: str, thread: List) -> None:
+        """Store a thread under the state it ends on, evicting the oldest"""
+        threads[key] = thread
+        while len(threads) > cls._MAX_THREADS:
+            del threads[next(iter(threads))]
+
+    def _analysis_turn(self, product_data: Dict, user_feedback: str, current_analysis: Dict) -> List:
+        """Pop (or seed) the refinement thread ending on this analysis.
+
+        The thread carries the product context once in the system message
+        and the analysis as the model's own prior reply; subsequent turns
+        append only the new feedback, so the full analysis is never
+        re-serialized into a fresh prompt. Popping means the thread is
+        owned by this turn alone until _finish_analysis_turn re-files it,
+        so concurrent sessions awaiting the LLM can't interleave on it.
+        """
+        serialized = json.dumps(current_analysis, separators=(',', ':'), default=str)
+        thread = self._analysis_threads.pop(serialized, None)
+        if thread is None:
+            # First refinement, or a caller holding state no thread ends
+            # on: start a fresh conversation
+            context = (
+                "You are an expert marketing analyst. Refine the product analysis "
+                "based on user feedback while maintaining accuracy.\n\n"
+                f"Product Name: {product_data.get('title', '')}\n"
+                f"Description: {product_data.get('description', '')}\n"
+                f"Price: {product_data.get('price', '')}\n\n"
+                "Always reply with the full refined analysis as JSON with keys: "
+                "category, features, target_audience, usps, marketing_angles, positioning"
+            )
+            thread = [
+                SystemMessage(content=context),
+                AIMessage(content=serialized),
+            ]
+        thread.append(HumanMessage(content=user_feedback))
+        return thread
+
+    def _finish_analysis_turn(self, thread: List, result: str, current_analysis: Dict) -> Dict:
+        refined = self._parse_analysis(result)
+        if refined is None:
+            # Drop the feedback message so the thread still ends with the
+            # analysis the caller holds, and re-file it under that state
+            thread.pop()
+            self._file_thread(
+                self._analysis_threads,
+                json.dumps(current_analysis, separators=(',', ':'), default=str),
+                thread
+            )
+            return current_analysis
+
+        serialized = json.dumps(refined, separators=(',', ':'), default=str)
+        thread.append(AIMessage(content=serialized))
+        self._file_thread(self._analysis_threads, serialized, thread)
+        # Store in memory
+        self.analysis_memory.append({
+            "role": "assistant",
+            "content": json.dumps(refined, indent=2)
+        })
+        return refined
+
     def _refine_analysis(self, product_data: Dict, user_feedback: str, current_analysis: Dict) -> Dict:
         """Refine analysis based on user feedback"""
-        
-        refinement_prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are an expert marketing analyst. Refine the product analysis based on user feedback while maintaining accuracy."),
-            ("human", """
-Current Analysis:
-{current_analysis}
 
-Product Context:
-Product Name: {title}
-Description: {description}
-Price: {price}
+        thread = self._analysis_turn(product_data, user_feedback, current_analysis)
+        result = self.fast_analysis_llm.invoke(thread).content
+        return self._finish_analysis_turn(thread, result, current_analysis)
 
-User Feedback: {feedback}
+    async def _arefine_analysis(self, product_data: Dict, user_feedback: str, current_analysis: Dict) -> Dict:
+        """Async twin of _refine_analysis for server-side callers"""
 
-Refine the analysis addressing the user's feedback. Maintain the JSON format with keys: category, features, target_audience, usps, marketing_angles, positioning
-""")
-        ])
-        
-        chain = refinement_prompt | self.llm | StrOutputParser()
-        
-        result = chain.invoke({
-            "current_analysis": json.dumps(current_analysis, indent=2),
-            "title": product_data.get('title', ''),
-            "description": product_data.get('description', ''),
-            "price": product_data.get('price', ''),
-            "feedback": user_feedback
-        })
-        
-        try:
-            refined = json.loads(result)
-            # Store in memory
-            self.analysis_memory.append({
-                "role": "assistant",
-                "content": json.dumps(refined, indent=2)
-            })
-            return refined
-        except:
-            return current_analysis
+        thread = self._analysis_turn(product_data, user_feedback, current_analysis)
+        result = (await self.fast_analysis_llm.ainvoke(thread)).content
+        return self._finish_analysis_turn(thread, result, current_analysis)
     
     def _display_analysis(self, analysis: Dict):
-        """Display analysis in a readable format"""
-        print("\n" + "-"*60)
-        print("📊 CURRENT ANALYSIS:")
-        print("-"*60)
-        for key, value in analysis.items():
-            print(f"\n🔹 {key.upper().replace('_', ' ')}:")
-            if isinstance(value, (list, dict)):
-                print(f"   {json.dumps(value, indent=3)}")
-            else:
-                print(f"   {value}")
-        print("-"*60)
+        """Display analysis in a readable format.
+
+        The render is built once per analysis object and reused on
+        redisplays: json.dumps over every nested field is the expensive
+        part, and the same dict is shown repeatedly while the user
+        iterates on unrelated feedback.
+        """
+        if id(analysis) != self._last_render_id:
+            lines = ["\n" + "-"*60, "📊 CURRENT ANALYSIS:", "-"*60]
+            for key, value in analysis.items():
+                lines.append(f"\n🔹 {key.upper().replace('_', ' ')}:")
+                if isinstance(value, (list, dict)):
+                    lines.append(f"   {json.dumps(value, indent=3)}")
+                else:
+                    lines.append(f"   {value}")
+            lines.append("-"*60)
+            self._last_render = "\n".join(lines)
+            self._last_render_id = id(analysis)
+        print(self._last_render)
     
     def generate_ad_scripts_interactive(self, product_data: Dict, analysis: Dict) -> List[str]:
         """
@@ -203,8 +448,22 @@ Refine the analysis addressing the user's feedback. Maintain the JSON format wit
         print("   Type 'confirm' when satisfied, or request modifications.")
         print("="*60 + "\n")
         
-        # Initial script generation
-        scripts = self._generate_scripts(product_data, analysis, [])
+        # Initial script generation: collect the speculative background
+        # run if it was made from this exact analysis, otherwise generate
+        # fresh (a stale guess still warms the response cache harmlessly)
+        scripts = None
+        if self._pending_scripts is not None:
+            if self._pending_analysis_id == id(analysis):
+                try:
+                    scripts = self._pending_scripts.result()
+                except Exception as e:
+                    print(f"⚠️  Background script generation failed, retrying: {e}")
+            else:
+                self._pending_scripts.cancel()
+        self._pending_scripts = None
+        self._pending_analysis_id = None
+        if scripts is None:
+            scripts = self._generate_scripts(product_data, analysis, [])
         self._display_scripts(scripts)
         
         # Feedback loop
@@ -233,99 +492,140 @@ Refine the analysis addressing the user's feedback. Maintain the JSON format wit
             
             iteration += 1
     
-    def _generate_scripts(self, product_data: Dict, analysis: Dict, conversation_history: List) -> List[str]:
-        """Generate initial ad scripts"""
-        
-        script_prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are a creative copywriter specializing in short-form video ad scripts for social media."),
-            ("human", """
-Create 3 unique short-form video ad scripts (30-45 seconds each) for this product:
-
-Product: {title}
-Target Audience: {target_audience}
-USPs: {usps}
-Marketing Angles: {marketing_angles}
-
-Each script should:
-- Hook viewers in the first 3 seconds
-- Address a pain point or desire
-- Highlight key benefits
-- Include a clear call-to-action
-- Be conversational and engaging
-- Use AIDA framework (Attention, Interest, Desire, Action)
-
-Format each script with:
-SCRIPT [1/2/3]:
-[Script content - spoken word only, 30-45 seconds when read aloud, around 100 words max.]
----
-
-Make each script distinctly different in approach (problem-solution, testimonial-style, lifestyle-focused).
-Output only the voice over without additional commentary.
-""")
-        ])
-        
-        chain = script_prompt | self.llm | StrOutputParser()
-        
-        result = chain.invoke({
+    @staticmethod
+    def _script_inputs(product_data: Dict, analysis: Dict) -> Dict:
+        return {
             "title": product_data.get('title', ''),
             "target_audience": str(analysis.get('target_audience', '')),
             "usps": str(analysis.get('usps', '')),
             "marketing_angles": str(analysis.get('marketing_angles', ''))
-        })
-        
+        }
+
+    def _generate_scripts(self, product_data: Dict, analysis: Dict, conversation_history: List, stream: bool = True) -> List[str]:
+        """Generate initial ad scripts.
+
+        stream=False runs the chain silently (used by the speculative
+        background prefetch, which must not write to the terminal while
+        the user is still typing analysis feedback).
+        """
+
+        inputs = self._script_inputs(product_data, analysis)
+
+        cache_key = _cache_key("pa_scripts", inputs)
+        cached = RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
+        if stream:
+            result = _stream_text(self.script_chain, inputs)
+        else:
+            result = self.script_chain.invoke(inputs)
+
         # Parse the scripts
         scripts = self._parse_scripts(result)
-        
+        RESPONSE_CACHE.set(cache_key, scripts)
+
         return scripts
-    
-    def _refine_scripts(self, product_data: Dict, analysis: Dict, user_feedback: str, current_scripts: List[str]) -> List[str]:
-        """Refine scripts based on user feedback"""
-        
-        refinement_prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are a creative copywriter. Refine the ad scripts based on user feedback while maintaining quality and effectiveness."),
-            ("human", """
-Current Scripts:
-{current_scripts}
 
-Product: {title}
-Target Audience: {target_audience}
-USPs: {usps}
+    async def _agenerate_scripts(self, product_data: Dict, analysis: Dict, conversation_history: List) -> List[str]:
+        """Async twin of _generate_scripts for server-side callers"""
 
-User Feedback: {feedback}
+        inputs = self._script_inputs(product_data, analysis)
 
-Refine the 3 scripts addressing the user's feedback. Maintain the format:
-SCRIPT [1/2/3]:
-[Script content]
----
+        cache_key = _cache_key("pa_scripts", inputs)
+        cached = RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
+        result = await self.script_chain.ainvoke(inputs)
 
-Keep scripts 30-45 seconds when read aloud (around 100 words max each).
-""")
-        ])
-        
-        chain = refinement_prompt | self.llm | StrOutputParser()
-        
-        # Format current scripts for display
-        scripts_text = ""
-        for i, script in enumerate(current_scripts, 1):
-            scripts_text += f"\nSCRIPT {i}:\n{script}\n---\n"
-        
-        result = chain.invoke({
-            "current_scripts": scripts_text,
-            "title": product_data.get('title', ''),
-            "target_audience": str(analysis.get('target_audience', '')),
-            "usps": str(analysis.get('usps', '')),
-            "feedback": user_feedback
-        })
-        
-        # Parse the refined scripts
         scripts = self._parse_scripts(result)
-        
+        RESPONSE_CACHE.set(cache_key, scripts)
+
+        return scripts
+
+
+    @staticmethod
+    def _serialize_scripts(scripts: List[str]) -> str:
+        return json.dumps(
+            {"scripts": [{"id": i, "text": s} for i, s in enumerate(scripts, 1)]},
+            separators=(',', ':')
+        )
+
+    def _script_turn(self, product_data: Dict, analysis: Dict, user_feedback: str, current_scripts: List[str]) -> List:
+        """Pop (or seed) the refinement thread ending on these scripts.
+
+        Same shape and ownership rules as _analysis_turn: context once,
+        scripts as the model's prior reply, then one feedback message per
+        iteration, with the thread held privately across the LLM await.
+        """
+        serialized = self._serialize_scripts(current_scripts)
+        thread = self._script_threads.pop(serialized, None)
+        if thread is None:
+            context = (
+                "You are a creative copywriter. Refine the ad scripts based on "
+                "user feedback while maintaining quality and effectiveness.\n\n"
+                f"Product: {product_data.get('title', '')}\n"
+                f"Target Audience: {analysis.get('target_audience', '')}\n"
+                f"USPs: {analysis.get('usps', '')}\n\n"
+                "Always reply with all 3 refined scripts as JSON in the form: "
+                '{"scripts": [{"id": 1, "text": "..."}, {"id": 2, "text": "..."}, {"id": 3, "text": "..."}]}\n'
+                "Keep scripts 30-45 seconds when read aloud (around 100 words max each)."
+            )
+            thread = [
+                SystemMessage(content=context),
+                AIMessage(content=serialized),
+            ]
+        thread.append(HumanMessage(content=user_feedback))
+        return thread
+
+    def _finish_script_turn(self, thread: List, result: str) -> List[str]:
+        scripts = self._parse_refined_scripts(result)
+        serialized = self._serialize_scripts(scripts)
+        thread.append(AIMessage(content=serialized))
+        self._file_thread(self._script_threads, serialized, thread)
+
         # Store in memory
         self.script_memory.append({
             "role": "assistant",
             "content": result
         })
-        
+
+        return scripts
+
+    def _refine_scripts(self, product_data: Dict, analysis: Dict, user_feedback: str, current_scripts: List[str]) -> List[str]:
+        """Refine scripts based on user feedback"""
+
+        # json_object mode returns all three scripts in one structured
+        # reply, so one round trip replaces the regex re-parse (and its
+        # occasional misfires on free-form output)
+        thread = self._script_turn(product_data, analysis, user_feedback, current_scripts)
+        result = self.fast_json_llm.invoke(thread).content
+        return self._finish_script_turn(thread, result)
+
+    async def _arefine_scripts(self, product_data: Dict, analysis: Dict, user_feedback: str, current_scripts: List[str]) -> List[str]:
+        """Async twin of _refine_scripts for server-side callers"""
+
+        thread = self._script_turn(product_data, analysis, user_feedback, current_scripts)
+        result = (await self.fast_json_llm.ainvoke(thread)).content
+        return self._finish_script_turn(thread, result)
+
+    def _parse_refined_scripts(self, result: str) -> List[str]:
+        """Parse the structured refinement reply, regex parser as fallback"""
+        scripts = []
+        try:
+            payload = json.loads(result)
+            scripts = [
+                str(item.get('text', '')).strip()
+                for item in payload.get('scripts', [])
+                if str(item.get('text', '')).strip()
+            ]
+        except (json.JSONDecodeError, AttributeError):
+            pass
+
+        # Fallback: model ignored the schema, salvage with the old parser
+        if not scripts:
+            scripts = self._parse_scripts(result)
         return scripts
     
     def _display_scripts(self, scripts: List[str]):
@@ -377,24 +677,20 @@ Keep scripts 30-45 seconds when read aloud (around 100 words max each).
     
     def _tweak_script(self, current_script: str, user_feedback: str) -> str:
         """Apply specific tweaks to a script"""
-        
-        tweak_prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are a creative copywriter. Modify the script based on specific user requests while maintaining effectiveness."),
-            ("human", """
-Current Script:
-{current_script}
 
-User Request: {feedback}
+        result = _stream_text(self.tweak_chain, {
+            "current_script": current_script,
+            "feedback": user_feedback
+        })
 
-Provide the modified script (30-45 seconds when read aloud). Output only the script content without labels or commentary.
-""")
-        ])
-        
-        chain = tweak_prompt | self.llm | StrOutputParser()
-        
-        result = chain.invoke({
+        return result.strip()
+
+    async def _atweak_script(self, current_script: str, user_feedback: str) -> str:
+        """Async twin of _tweak_script for server-side callers"""
+
+        result = await self.tweak_chain.ainvoke({
             "current_script": current_script,
             "feedback": user_feedback
         })
-        
+
         return result.strip()
\ No newline at end of file
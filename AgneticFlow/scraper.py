@@ -1,26 +1,55 @@
 from bs4 import BeautifulSoup
+import copy
 import os
 import requests
+import time
 from typing import List, Dict, Optional
 import json
 from urllib.parse import urljoin, urlparse
 from PIL import Image
 from io import BytesIO
 
+# lxml is a C-extension parser, typically several times faster than the
+# pure-Python html.parser; fall back when the extra isn't installed
+try:
+    import lxml  # noqa: F401
+    _SOUP_PARSER = 'lxml'
+except ImportError:
+    _SOUP_PARSER = 'html.parser'
+
+# Scrape results keyed by URL: interactive sessions and workflow re-runs
+# revisit the same product page, and product data rarely changes within a
+# day. Bounded like image_generation's caches so a long-running server
+# visiting many distinct URLs can't grow without limit
+_SCRAPE_CACHE: Dict[str, tuple] = {}
+_SCRAPE_TTL = 86400
+_SCRAPE_CACHE_MAX = 64
+
+
 class ProductScraper:
     """Handles web scraping of product and store data"""
-    
+
     def __init__(self):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
-    
-    def scrape_url(self, url: str) -> Dict:
-        """Scrape product or store page"""
+
+    def scrape_url(self, url: str, force_rescrape: bool = False) -> Dict:
+        """Scrape product or store page.
+
+        Results are cached per URL for a day; pass force_rescrape=True to
+        bypass the cache (e.g. after a known product update).
+        """
+        if not force_rescrape:
+            hit = _SCRAPE_CACHE.get(url)
+            if hit and time.time() - hit[1] < _SCRAPE_TTL:
+                # Deep copy so callers mutating the result (feedback keys,
+                # current_scripts, etc.) don't pollute the cache
+                return copy.deepcopy(hit[0])
         try:
             response = requests.get(url, headers=self.headers, timeout=10)
             response.raise_for_status()
-            soup    = BeautifulSoup(response.content, 'html.parser')
+            soup    = BeautifulSoup(response.content, _SOUP_PARSER)
             
             # Extract basic information
             title = self._extract_title(soup)
@@ -32,7 +61,7 @@ class ProductScraper:
             is_store = self._is_store_page(soup, url)
             products = self._extract_products(soup) if is_store else []
             
-            return {
+            result = {
                 "url": url,
                 "title": title,
                 "description": description,
@@ -43,6 +72,11 @@ class ProductScraper:
                 "raw_text": soup.get_text()[:2000],
                 "downloaded_images": self._download_images(soup, url)
             }
+            if len(_SCRAPE_CACHE) >= _SCRAPE_CACHE_MAX:
+                # Dicts iterate in insertion order: drop the oldest entry
+                del _SCRAPE_CACHE[next(iter(_SCRAPE_CACHE))]
+            _SCRAPE_CACHE[url] = (copy.deepcopy(result), time.time())
+            return result
         except Exception as e:
             return {"error": f"Failed to scrape URL: {str(e)}"}
     
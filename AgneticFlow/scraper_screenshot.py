@@ -5,6 +5,14 @@ from urllib.parse import urljoin, urlparse
 from PIL import Image
 from io import BytesIO
 
+# lxml is a C-extension parser, typically several times faster than the
+# pure-Python html.parser; fall back when the extra isn't installed
+try:
+    import lxml  # noqa: F401
+    _SOUP_PARSER = 'lxml'
+except ImportError:
+    _SOUP_PARSER = 'html.parser'
+
 def scrape_product_images(url, output_folder='static'):
     """
     Scrapes a product URL for images and saves them to a static folder.
@@ -27,7 +35,7 @@ def scrape_product_images(url, output_folder='static'):
         response = requests.get(url, headers=headers)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(response.content, _SOUP_PARSER)
         img_tags = soup.find_all('img')
         
         print(f"Found {len(img_tags)} image tags.")
@@ -96,24 +96,26 @@ async def scrape_product(request: ScrapeRequest):
 
 @app.post("/api/analyze")
 async def analyze_product(request: AnalyzeRequest):
+    # await the async twins so the multi-second LLM calls don't block
+    # the event loop (and with it every other in-flight request)
     if request.feedback and request.current_analysis:
         print("Refining analysis...")
-        analysis = analyzer._refine_analysis(
-            request.product_data, 
-            request.feedback, 
+        analysis = await analyzer._arefine_analysis(
+            request.product_data,
+            request.feedback,
             request.current_analysis
         )
     else:
         print("Generating initial analysis...")
-        analysis = analyzer._generate_analysis(request.product_data, [])
-    
+        analysis = await analyzer._agenerate_analysis(request.product_data, [])
+
     return analysis
 
 @app.post("/api/scripts")
 async def generate_scripts(request: ScriptRequest):
     if request.feedback and request.current_scripts:
         print("Refining scripts...")
-        scripts = analyzer._refine_scripts(
+        scripts = await analyzer._arefine_scripts(
             request.product_data,
             request.analysis,
             request.feedback,
@@ -121,7 +123,7 @@ async def generate_scripts(request: ScriptRequest):
         )
     else:
         print("Generating initial scripts...")
-        scripts = analyzer._generate_scripts(
+        scripts = await analyzer._agenerate_scripts(
             request.product_data,
             request.analysis,
             []
@@ -131,7 +133,7 @@ async def generate_scripts(request: ScriptRequest):
 @app.post("/api/refine_script")
 async def refine_script(request: RefineScriptRequest):
     print("Tweaking script...")
-    refined_script = analyzer._tweak_script(request.script, request.feedback)
+    refined_script = await analyzer._atweak_script(request.script, request.feedback)
     return {"script": refined_script}
 
 @app.post("/api/audio")
@@ -172,7 +174,7 @@ async def generate_images(request: ImageGenerationRequest):
 
 @app.get("/api/avatars")
 async def get_avatars():
-    avatars = heygen.get_avatars()
+    avatars = await heygen.aget_avatars()
     return {"avatars": avatars}
 
 @app.post("/api/heygen/upload")
@@ -190,7 +192,7 @@ async def upload_heygen_asset(request: AudioRequest):
          else:
              raise HTTPException(status_code=404, detail="Audio file not found")
              
-    asset_id = heygen.upload_asset(file_path)
+    asset_id = await heygen.aupload_asset(file_path)
     if not asset_id:
         raise HTTPException(status_code=500, detail="Failed to upload audio asset")
         
@@ -203,14 +205,14 @@ class HeyGenVideoRequest(BaseModel):
 @app.post("/api/heygen/generate")
 async def generate_heygen_video(request: HeyGenVideoRequest):
     print(f"Generating video with Avatar: {request.avatar_id} and Asset: {request.audio_asset_id}")
-    result = heygen.create_avatar_video(request.audio_asset_id, avatar_id=request.avatar_id, is_asset_id=True)
+    result = await heygen.acreate_avatar_video(request.audio_asset_id, avatar_id=request.avatar_id, is_asset_id=True)
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
     return result
 
 @app.get("/api/video_status/{video_id}")
 async def check_video_status(video_id: str):
-    status = heygen.check_video_status(video_id)
+    status = await heygen.acheck_video_status(video_id)
     return status
 
 # Mount static files to serve audio
@@ -13,7 +13,7 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from workflow_graph import AdCampaignWorkflow
-from state_schema import WorkflowState
+from state_schema import WorkflowState, initial_state
 
 load_dotenv()
 
@@ -49,9 +49,70 @@ async def validation_exception_handler(request, exc):
 # Initialize workflow
 workflow = AdCampaignWorkflow()
 
+# One integrator for every endpoint that talks to HeyGen directly
+from heygen import HeyGenAvatarIntegrator
+heygen_integrator = HeyGenAvatarIntegrator()
+
 # Store active sessions (thread_id -> state)
 active_sessions: Dict[str, WorkflowState] = {}
 
+
+@app.on_event("startup")
+async def prefetch_avatars():
+    """Fill the TTL avatar cache before the first user asks for it.
+
+    Runs in the background so it never delays startup; the first
+    /api/workflow/avatars call then hits the warm cache instead of
+    paying a full-catalog round-trip.
+    """
+    import asyncio
+
+    if os.getenv("SKIP_LLM_WARMUP"):
+        return
+
+    async def fetch():
+        try:
+            avatars = await heygen_integrator.aget_avatars()
+            if avatars:
+                print(f"✓ Prefetched {len(avatars)} HeyGen avatars")
+        except Exception as e:
+            print(f"Avatar prefetch skipped: {e}")
+
+    asyncio.create_task(fetch())
+
+
+@app.on_event("startup")
+async def warm_llm_clients():
+    """Warm the shared LLM clients before the first user request.
+
+    All ChatOpenAI instances from agents.get_llm ride one shared httpx
+    pool, so a one-token ping on the cheapest instance the agents
+    actually use (the NavigationAgent router client) establishes the TLS
+    session for every agent. Failures (e.g. no network yet) are
+    non-fatal. Set SKIP_LLM_WARMUP=1 to disable (useful in tests and
+    offline development).
+    """
+    if os.getenv("SKIP_LLM_WARMUP"):
+        print("LLM warm-up disabled via SKIP_LLM_WARMUP")
+        return
+    from agents import get_llm
+    try:
+        router_llm = get_llm("gpt-4o-mini", temperature=0, json_mode=True, max_tokens=150)
+        # json_object mode requires the word JSON in the prompt
+        await router_llm.ainvoke("Reply with an empty JSON object.")
+        print("✓ LLM connection pool warmed")
+    except Exception as e:
+        print(f"LLM warm-up skipped: {e}")
+
+
+@app.on_event("shutdown")
+async def close_http_pools():
+    """Close shared HTTP connection pools cleanly on shutdown"""
+    import audioGeneration
+    import heygen
+    await audioGeneration.close_async_client()
+    await heygen.close_async_client()
+
 # --- Pydantic Models ---
 
 class WorkflowRequest(BaseModel):
@@ -97,6 +158,14 @@ class SelectProductRequest(WorkflowRequest):
 
 # --- Helper Functions ---
 
+def add_user_message(state: WorkflowState, content: str) -> None:
+    """Append a user message and keep the last_user_message pointer current"""
+    state["messages"].append({
+        "role": "user",
+        "content": content
+    })
+    state["last_user_message"] = content
+
 def get_or_create_thread(thread_id: Optional[str] = None) -> str:
     """Get existing thread_id or create new one"""
     if not thread_id:
@@ -104,33 +173,7 @@ def get_or_create_thread(thread_id: Optional[str] = None) -> str:
     
     if thread_id not in active_sessions:
         # Initialize new state
-        active_sessions[thread_id] = {
-            "current_step": "scrape",
-            "navigation_intent": None,
-            "messages": [],
-            "url": None,
-            "product_data": None,
-            "selected_product": None,
-            "analysis": None,
-            "analysis_feedback": [],
-            "scripts": None,
-            "script_feedback": [],
-            "selected_script_index": None,
-            "selected_script": None,
-            "script_refinement_feedback": [],
-            "generated_images": None,
-            "image_feedback": [],
-            "image_generation_prompt": None,
-            "audio_file": None,
-            "audio_url": None,
-            "available_avatars": None,
-            "selected_avatar_id": None,
-            "video_id": None,
-            "video_url": None,
-            "video_status": None,
-            "error": None,
-            "iteration_count": {}
-        }
+        active_sessions[thread_id] = initial_state()
     
     return thread_id
 
@@ -163,10 +206,7 @@ def update_state_from_request(state: WorkflowState, request: WorkflowRequest) ->
     
     if request.message:
         # Add message to state for chat-based editing
-        state["messages"].append({
-            "role": "user",
-            "content": request.message
-        })
+        add_user_message(state, request.message)
     
     return state
 
@@ -208,10 +248,7 @@ async def analyze_product(request: AnalyzeRequest):
     state["current_step"] = "analyze"
     if request.feedback:
         state["analysis_feedback"].append(request.feedback)
-        state["messages"].append({
-            "role": "user",
-            "content": request.feedback
-        })
+        add_user_message(state, request.feedback)
     state = update_state_from_request(state, request)
     
     # Run workflow step
@@ -242,10 +279,7 @@ async def generate_scripts(request: ScriptRequest):
     state["current_step"] = "generate_scripts"
     if request.feedback:
         state["script_feedback"].append(request.feedback)
-        state["messages"].append({
-            "role": "user",
-            "content": request.feedback
-        })
+        add_user_message(state, request.feedback)
     state = update_state_from_request(state, request)
     
     # Run workflow step
@@ -263,6 +297,126 @@ async def generate_scripts(request: ScriptRequest):
         "error": result.get("error")
     }
 
+@app.post("/api/workflow/analyze/stream")
+async def analyze_product_stream(request: AnalyzeRequest):
+    """Analyze the product, streaming tokens over SSE as they arrive.
+
+    Time-to-first-byte drops from the full completion time to the first
+    token; the final event carries the parsed analysis dict.
+    """
+    import asyncio
+    import json
+    from fastapi.responses import StreamingResponse
+
+    thread_id = get_or_create_thread(request.thread_id)
+    state = active_sessions[thread_id]
+
+    # Update state
+    state["current_step"] = "analyze"
+    if request.feedback:
+        state["analysis_feedback"].append(request.feedback)
+        add_user_message(state, request.feedback)
+    state = update_state_from_request(state, request)
+
+    product_data = state.get("selected_product") or state.get("product_data")
+    if not product_data:
+        raise HTTPException(status_code=400, detail="Scrape a product before analyzing")
+
+    if state.get("analysis"):
+        product_data["current_analysis"] = state["analysis"]
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            analysis = await workflow.analysis_agent.analyze(
+                product_data,
+                state.get("analysis_feedback", []),
+                on_token=lambda token: queue.put_nowait(("token", token))
+            )
+            state["analysis"] = analysis
+            active_sessions[thread_id] = state
+            queue.put_nowait(("done", analysis))
+        except Exception as e:
+            queue.put_nowait(("error", str(e)))
+
+    async def event_stream():
+        task = asyncio.create_task(produce())
+        try:
+            while True:
+                kind, payload = await queue.get()
+                if kind == "token":
+                    yield f"data: {json.dumps({'token': payload})}\n\n"
+                elif kind == "done":
+                    yield f"data: {json.dumps({'analysis': payload, 'thread_id': thread_id})}\n\n"
+                    break
+                else:
+                    yield f"data: {json.dumps({'error': payload})}\n\n"
+                    break
+        finally:
+            task.cancel()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.post("/api/workflow/generate_scripts/stream")
+async def generate_scripts_stream(request: ScriptRequest):
+    """Generate ad scripts, streaming tokens over SSE as they arrive"""
+    import asyncio
+    import json
+    from fastapi.responses import StreamingResponse
+
+    thread_id = get_or_create_thread(request.thread_id)
+    state = active_sessions[thread_id]
+
+    # Update state
+    state["current_step"] = "generate_scripts"
+    if request.feedback:
+        state["script_feedback"].append(request.feedback)
+        add_user_message(state, request.feedback)
+    state = update_state_from_request(state, request)
+
+    product_data = state.get("selected_product") or state.get("product_data")
+    analysis = state.get("analysis")
+    if not product_data or not analysis:
+        raise HTTPException(status_code=400, detail="Scrape and analyze before generating scripts")
+
+    if state.get("scripts"):
+        product_data["current_scripts"] = state["scripts"]
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            scripts = await workflow.script_agent.generate_scripts(
+                product_data,
+                analysis,
+                state.get("script_feedback", []),
+                on_token=lambda token: queue.put_nowait(("token", token))
+            )
+            state["scripts"] = scripts
+            active_sessions[thread_id] = state
+            queue.put_nowait(("done", scripts))
+        except Exception as e:
+            queue.put_nowait(("error", str(e)))
+
+    async def event_stream():
+        task = asyncio.create_task(produce())
+        try:
+            while True:
+                kind, payload = await queue.get()
+                if kind == "token":
+                    yield f"data: {json.dumps({'token': payload})}\n\n"
+                elif kind == "done":
+                    yield f"data: {json.dumps({'scripts': payload, 'thread_id': thread_id})}\n\n"
+                    break
+                else:
+                    yield f"data: {json.dumps({'error': payload})}\n\n"
+                    break
+        finally:
+            task.cancel()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.post("/api/workflow/select_script")
 async def select_script(request: SelectScriptRequest):
     """Select a script by index"""
@@ -297,10 +451,7 @@ async def refine_script(request: RefineScriptRequest):
     
     # Update state
     state["current_step"] = "refine_script"
-    state["messages"].append({
-        "role": "user",
-        "content": request.feedback
-    })
+    add_user_message(state, request.feedback)
     state = update_state_from_request(state, request)
     
     # Run workflow step
@@ -328,10 +479,7 @@ async def generate_images(request: GenerateImagesRequest):
     state["current_step"] = "generate_images"
     if request.feedback:
         state["image_feedback"].append(request.feedback)
-        state["messages"].append({
-            "role": "user",
-            "content": request.feedback
-        })
+        add_user_message(state, request.feedback)
     state = update_state_from_request(state, request)
     
     # Run workflow step
@@ -359,10 +507,7 @@ async def refine_images(request: RefineImagesRequest):
     # Update state
     state["current_step"] = "refine_images"
     state["image_feedback"].append(request.feedback)
-    state["messages"].append({
-        "role": "user",
-        "content": request.feedback
-    })
+    add_user_message(state, request.feedback)
     state = update_state_from_request(state, request)
     
     # Run workflow step
@@ -442,9 +587,7 @@ async def get_avatars(thread_id: Optional[str] = None):
     
     # If avatars not loaded, load them
     if not state.get("available_avatars"):
-        from heygen import HeyGenAvatarIntegrator
-        heygen = HeyGenAvatarIntegrator()
-        avatars = heygen.get_avatars()
+        avatars = await heygen_integrator.aget_avatars()
         state["available_avatars"] = avatars
         active_sessions[thread_id] = state
     
@@ -480,6 +623,40 @@ async def generate_video(request: GenerateVideoRequest):
         "error": result.get("error")
     }
 
+@app.get("/api/workflow/video_status/stream/{video_id}")
+async def video_status_stream(video_id: str):
+    """Push HeyGen render status over SSE instead of client-side polling.
+
+    The server polls HeyGen with the same backoff as heygen.await_video
+    and emits an event per status change, so the browser gets
+    "completed" on the next poll tick rather than on its own timer.
+    """
+    import asyncio
+    import json
+    from fastapi.responses import StreamingResponse
+
+    async def event_stream():
+        delay = 2.0
+        last_status = None
+        deadline = asyncio.get_event_loop().time() + 600
+        while asyncio.get_event_loop().time() < deadline:
+            result = await heygen_integrator.acheck_video_status(video_id)
+            if "error" in result:
+                yield f"data: {json.dumps({'error': result['error']})}\n\n"
+                return
+            data = result.get("data", {})
+            status = data.get("status")
+            if status != last_status:
+                last_status = status
+                yield f"data: {json.dumps({'status': status, 'video_url': data.get('video_url')})}\n\n"
+            if status in ("completed", "failed"):
+                return
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+        yield f"data: {json.dumps({'error': 'timeout'})}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.get("/api/workflow/state/{thread_id}")
 async def get_state(thread_id: str):
     """Get current workflow state"""
@@ -524,10 +701,7 @@ async def chat(request: WorkflowRequest):
         raise HTTPException(status_code=400, detail="Message is required")
     
     # Add message to state
-    state["messages"].append({
-        "role": "user",
-        "content": request.message
-    })
+    add_user_message(state, request.message)
     
     # Determine which step to route to based on current step
     current_step = state.get("current_step", "scrape")
@@ -2,6 +2,7 @@
 State schema for LangGraph workflow
 Defines the complete state that persists across all steps
 """
+import copy
 from typing import TypedDict, List, Dict, Optional, Any, Literal
 from langgraph.graph.message import add_messages
 
@@ -29,6 +30,10 @@ class WorkflowState(TypedDict):
     
     # User messages/feedback for chat-based editing
     messages: List[Dict[str, Any]]
+
+    # Maintained pointer to the latest user message so consumers don't
+    # rescan the full history every turn
+    last_user_message: Optional[str]
     
     # Step 1: Scraping
     url: Optional[str]
@@ -72,3 +77,41 @@ class WorkflowState(TypedDict):
     # Metadata
     iteration_count: Dict[str, int]  # Track iterations per step
 
+
+# Built once at import; every new thread starts from a deep copy of this
+# template instead of re-allocating the 25-key literal at each call site
+_INITIAL_STATE: WorkflowState = {
+    "current_step": "scrape",
+    "navigation_intent": None,
+    "messages": [],
+    "last_user_message": None,
+    "url": None,
+    "product_data": None,
+    "selected_product": None,
+    "analysis": None,
+    "analysis_feedback": [],
+    "scripts": None,
+    "script_feedback": [],
+    "selected_script_index": None,
+    "selected_script": None,
+    "script_refinement_feedback": [],
+    "generated_images": None,
+    "image_feedback": [],
+    "image_generation_prompt": None,
+    "audio_file": None,
+    "audio_url": None,
+    "available_avatars": None,
+    "selected_avatar_id": None,
+    "video_id": None,
+    "video_url": None,
+    "video_status": None,
+    "error": None,
+    "iteration_count": {}
+}
+
+
+def initial_state() -> WorkflowState:
+    """Return a fresh workflow state for a new thread"""
+    # deepcopy so the mutable lists/dicts aren't shared between threads
+    return copy.deepcopy(_INITIAL_STATE)
+
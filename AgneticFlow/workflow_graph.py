@@ -5,7 +5,7 @@ Supports bidirectional navigation and context-aware memory
 from typing import Dict, Any, Literal
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
-from state_schema import WorkflowState
+from state_schema import WorkflowState, initial_state
 from scraper import ProductScraper
 from agents import AnalysisAgent, ScriptGenerationAgent, ImageGenerationAgent, NavigationAgent
 from audioGeneration import ElevenLabsVoiceGenerator
@@ -87,8 +87,16 @@ class AdCampaignWorkflow:
     
     async def _route_node(self, state: WorkflowState) -> Dict[str, Any]:
         """Entry point node that determines navigation"""
-        # Analyze intent using agent
-        result = await self.navigation_agent.analyze_intent(state)
+        # Analyze intent using agent; only the two fields the router prompt
+        # actually reads are passed, never the whole history
+        if state.get("last_user_message"):
+            result = await self.navigation_agent.analyze_intent(
+                state.get("current_step", "scrape"),
+                state["last_user_message"]
+            )
+        else:
+            # Older states only carry messages; the agent's compat shim scans them
+            result = await self.navigation_agent.analyze_intent(state)
         intent = result.get("intent")
         
         print(f"Navigation Intent: {intent} (Reason: {result.get('reasoning')})")
@@ -346,17 +354,10 @@ class AdCampaignWorkflow:
         )
         state["image_generation_prompt"] = image_prompt
         
-        # Generate images
+        # Generate images off the event loop; the underlying SDK is
+        # synchronous, so each image runs on its own worker thread
         product_url = product_data.get("url")
-        # Note: image_gen.generate_images is still synchronous as it uses Selenium/requests
-        # We might need to wrap it in run_in_executor if it blocks too long, but for now let's keep it sync
-        # as it's not an LLM call causing the specific error we're fixing.
-        # However, if we wanted to be fully async:
-        # import asyncio
-        # loop = asyncio.get_running_loop()
-        # images = await loop.run_in_executor(None, self.image_agent.generate_images, product_url, image_prompt, 2)
-        
-        images = self.image_agent.generate_images(product_url, image_prompt, num_images=2)
+        images = await self.image_agent.agenerate_images(product_url, image_prompt, num_images=2)
         state["generated_images"] = images
         
         # Update iteration count
@@ -373,24 +374,24 @@ class AdCampaignWorkflow:
         # This is essentially the same as generate_images but with explicit feedback
         return await self._generate_images_node(state)
     
-    def _generate_audio_node(self, state: WorkflowState) -> WorkflowState:
+    async def _generate_audio_node(self, state: WorkflowState) -> WorkflowState:
         """Generate audio using Eleven Labs"""
         # Update current_step in state
         state["current_step"] = "generate_audio"
-        
+
         selected_script = state.get("selected_script")
         if not selected_script:
             state["error"] = "No script selected. Please select a script first."
             return state
-        
+
         # Check if audio already exists (if navigating back)
         if state.get("audio_file") and os.path.exists(state["audio_file"]):
             return state
-        
-        # Generate audio
+
+        # Generate audio (async/streaming so the server event loop isn't blocked)
         os.makedirs("static/audio", exist_ok=True)
         filename = f"static/audio/generated_audio_{state.get('iteration_count', {}).get('generate_audio', 0)}.mp3"
-        audio_file = self.audio_gen.generate_voice(selected_script, filename)
+        audio_file = await self.audio_gen.agenerate_voice(selected_script, filename)
         
         if audio_file:
             state["audio_file"] = audio_file
@@ -405,14 +406,14 @@ class AdCampaignWorkflow:
         
         return state
     
-    def _select_avatar_node(self, state: WorkflowState) -> WorkflowState:
+    async def _select_avatar_node(self, state: WorkflowState) -> WorkflowState:
         """Select HeyGen avatar"""
         # Update current_step in state
         state["current_step"] = "select_avatar"
-        
+
         # Fetch avatars if not already fetched
         if not state.get("available_avatars"):
-            avatars = self.heygen.get_avatars()
+            avatars = await self.heygen.aget_avatars()
             state["available_avatars"] = avatars
         
         # Avatar selection is handled by frontend
@@ -426,7 +427,7 @@ class AdCampaignWorkflow:
         
         return state
     
-    def _generate_video_node(self, state: WorkflowState) -> WorkflowState:
+    async def _generate_video_node(self, state: WorkflowState) -> WorkflowState:
         """Generate HeyGen video"""
         # Update current_step in state
         state["current_step"] = "generate_video"
@@ -445,14 +446,14 @@ class AdCampaignWorkflow:
         # Upload audio to HeyGen if not already uploaded
         # For now, we'll assume the audio needs to be uploaded each time
         # In production, you might want to cache the asset_id
-        asset_id = self.heygen.upload_asset(audio_file)
+        asset_id = await self.heygen.aupload_asset(audio_file)
         
         if not asset_id:
             state["error"] = "Failed to upload audio to HeyGen"
             return state
         
         # Create video
-        result = self.heygen.create_avatar_video(asset_id, avatar_id=avatar_id, is_asset_id=True)
+        result = await self.heygen.acreate_avatar_video(asset_id, avatar_id=avatar_id, is_asset_id=True)
         
         if "error" in result:
             state["error"] = result["error"]
@@ -462,7 +463,7 @@ class AdCampaignWorkflow:
         state["video_id"] = video_id
         
         # Check status
-        status = self.heygen.check_video_status(video_id)
+        status = await self.heygen.acheck_video_status(video_id)
         state["video_status"] = status.get("status", "processing")
         state["video_url"] = status.get("video_url")
         
@@ -488,31 +489,5 @@ class AdCampaignWorkflow:
         # Get the latest state from memory
         # This is a simplified version - in production you'd use get_state_stream
         # For now, return empty state - server maintains state
-        return {
-            "current_step": "scrape",
-            "navigation_intent": None,
-            "messages": [],
-            "url": None,
-            "product_data": None,
-            "selected_product": None,
-            "analysis": None,
-            "analysis_feedback": [],
-            "scripts": None,
-            "script_feedback": [],
-            "selected_script_index": None,
-            "selected_script": None,
-            "script_refinement_feedback": [],
-            "generated_images": None,
-            "image_feedback": [],
-            "image_generation_prompt": None,
-            "audio_file": None,
-            "audio_url": None,
-            "available_avatars": None,
-            "selected_avatar_id": None,
-            "video_id": None,
-            "video_url": None,
-            "video_status": None,
-            "error": None,
-            "iteration_count": {}
-        }
+        return initial_state()
 